@@ -1,8 +1,17 @@
+import functools
 import os
+from types import MappingProxyType
+from typing import Mapping, Tuple
 from dotenv import load_dotenv
 
 load_dotenv()
 
+
+def _env_list(name: str) -> Tuple[str, ...]:
+    """Comma-separated environment variable as a tuple (empty if unset)."""
+    return tuple(item.strip() for item in os.getenv(name, "").split(",") if item.strip())
+
+
 class Config:
     """Configuration for CodeRover multi-model agent."""
     
@@ -10,6 +19,17 @@ class Config:
     GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
     # OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
     GROQ_API_KEY = os.getenv("GROQ_API_KEY")  # If you want to use Groq models
+    ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")  # If you want to use Anthropic models
+    
+    # Optional comma-separated key/URL lists (e.g. GROQ_API_KEYS=k1,k2).
+    # Requests rotate across them to spread load over several rate limits;
+    # a single key or URL is paired with every entry of the other list.
+    GEMINI_API_KEYS = _env_list("GEMINI_API_KEYS")
+    GROQ_API_KEYS = _env_list("GROQ_API_KEYS")
+    ANTHROPIC_API_KEYS = _env_list("ANTHROPIC_API_KEYS")
+    GEMINI_BASE_URLS = _env_list("GEMINI_BASE_URLS")
+    GROQ_BASE_URLS = _env_list("GROQ_BASE_URLS")
+    ANTHROPIC_BASE_URLS = _env_list("ANTHROPIC_BASE_URLS")
     
     # Model Selection
     ORCHESTRATOR_MODEL = os.getenv("ORCHESTRATOR_MODEL", "gemini-2.0-flash")
@@ -19,6 +39,7 @@ class Config:
     GEMINI_BASE_URL = "https://generativelanguage.googleapis.com/v1beta"
     # OPENAI_BASE_URL = "https://api.openai.com/v1"
     GROQ_BASE_URL = "https://api.groq.com/openai/v1"
+    ANTHROPIC_BASE_URL = "https://api.anthropic.com/v1"
     
     # LLM Settings
     LLM_TIMEOUT = int(os.getenv("LLM_TIMEOUT", "60"))
@@ -27,6 +48,28 @@ class Config:
     # Code Writer Settings
     CODE_WRITER_TEMPS = [0.2, 0.7, 1.0]
     CODE_WRITER_MAX_TOKENS = int(os.getenv("CODE_WRITER_MAX_TOKENS", "2000"))
+    # Skip the remaining temperatures once the lowest one scores this high
+    CODE_WRITER_EARLY_EXIT = float(os.getenv("CODE_WRITER_EARLY_EXIT", "0.85"))
+    # Stream candidates and abort those that don't look like code early on.
+    # Off by default: streamed candidates are one request per temperature,
+    # not a single n-sample request per distinct temperature.
+    CODE_WRITER_STREAM_ABORT = os.getenv("CODE_WRITER_STREAM_ABORT", "0") == "1"
+    # Stop streaming a candidate once its code looks finished (see looks_complete)
+    CODE_WRITER_STOP_WHEN_COMPLETE = os.getenv("CODE_WRITER_STOP_WHEN_COMPLETE", "0") == "1"
+    # Have the orchestrator sketch a draft for the code writer to refine
+    CODE_WRITER_USE_DRAFT = os.getenv("CODE_WRITER_USE_DRAFT", "0") == "1"
+    # Plan and write code in one request; also used automatically when the
+    # orchestrator and code writer are the same model
+    SINGLE_MODEL_FASTPATH = os.getenv("SINGLE_MODEL_FASTPATH", "0") == "1"
+    
+    # Orchestrator Settings
+    ORCHESTRATOR_CACHE_SIZE = int(os.getenv("ORCHESTRATOR_CACHE_SIZE", "1024"))
+    # Shelve file for persisting orchestrator responses across runs
+    # (e.g. ~/.coderover_cache); unset keeps the cache in memory only
+    ORCHESTRATOR_CACHE_PATH = os.getenv("ORCHESTRATOR_CACHE_PATH")
+    # Also answer paraphrased questions from an embedding cache in
+    # .llm_semcache/ (needs sentence-transformers)
+    ORCHESTRATOR_SEMANTIC_CACHE = os.getenv("ORCHESTRATOR_SEMANTIC_CACHE", "0") == "1"
     
     @classmethod
     def validate_config(cls):
@@ -50,34 +93,56 @@ class Config:
             if not cls.GROQ_API_KEY:
                 errors.append("GROQ_API_KEY required for Groq models")
         
+        if "claude" in cls.ORCHESTRATOR_MODEL.lower() or "claude" in cls.CODEWRITER_MODEL.lower():
+            if not cls.ANTHROPIC_API_KEY:
+                errors.append("ANTHROPIC_API_KEY required for Anthropic models")
+        
         if errors:
             raise ValueError("\n  - ".join([""] + errors))
     
+    # Provider lookup, checked in order:
+    # (provider, model-name substrings, api key attribute, base URL attribute)
+    _PROVIDER_TABLE = (
+        ("gemini", ("gemini",), "GEMINI_API_KEY", "GEMINI_BASE_URL"),
+        # ("openai", ("gpt", "openai"), "OPENAI_API_KEY", "OPENAI_BASE_URL"),
+        ("groq", ("groq", "openai/gpt-oss-120b", "mixtral"), "GROQ_API_KEY", "GROQ_BASE_URL"),
+        ("anthropic", ("claude",), "ANTHROPIC_API_KEY", "ANTHROPIC_BASE_URL"),
+    )
+    
     @classmethod
-    def get_model_config(cls, model_name: str) -> dict:
-        """Get the appropriate API key and base URL for a model."""
+    @functools.lru_cache(maxsize=32)
+    def get_model_config(cls, model_name: str) -> Mapping[str, str]:
+        """Get the appropriate API key and base URL for a model.
+        
+        "endpoints" holds every (api_key, base_url) pair configured for the
+        provider (see GROQ_API_KEYS etc.); "api_key" and "base_url" are the
+        first one. Results are cached per model name and returned
+        read-only; call Config.get_model_config.cache_clear() after
+        changing keys or URLs.
+        """
         model_lower = model_name.lower()
         
-        if "gemini" in model_lower:
-            return {
-                "api_key": cls.GEMINI_API_KEY,
-                "base_url": cls.GEMINI_BASE_URL,
-                "provider": "gemini"
-            }
-        # elif "gpt" in model_lower or "openai" in model_lower:
-        #     return {
-        #         "api_key": cls.OPENAI_API_KEY,
-        #         "base_url": cls.OPENAI_BASE_URL,
-        #         "provider": "openai"
-        #     }
-        elif "groq" in model_lower or any(x in model_lower for x in ["openai/gpt-oss-120b", "mixtral"]):
-            return {
-                "api_key": cls.GROQ_API_KEY,
-                "base_url": cls.GROQ_BASE_URL,
-                "provider": "groq"
-            }
-        else:
-            raise ValueError(f"Unknown model provider for: {model_name}")
+        for provider, needles, key_attr, url_attr in cls._PROVIDER_TABLE:
+            if any(needle in model_lower for needle in needles):
+                keys = getattr(cls, key_attr + "S") or (getattr(cls, key_attr),)
+                urls = getattr(cls, url_attr + "S") or (getattr(cls, url_attr),)
+                if len(keys) > 1 and len(urls) > 1 and len(keys) != len(urls):
+                    raise ValueError(
+                        f"{key_attr}S and {url_attr}S must have the same length"
+                    )
+                if len(keys) == 1:
+                    keys = keys * len(urls)
+                if len(urls) == 1:
+                    urls = urls * len(keys)
+                endpoints = tuple(zip(keys, urls))
+                return MappingProxyType({
+                    "api_key": endpoints[0][0],
+                    "base_url": endpoints[0][1],
+                    "provider": provider,
+                    "endpoints": endpoints
+                })
+        
+        raise ValueError(f"Unknown model provider for: {model_name}")
     
     @classmethod
     def get_gemini_key(cls):
@@ -4,6 +4,14 @@
 from .llm_interfaces import LLMInterface
 
 # Import adapters
+from .generic_llm import EmptyResponseError, LLMHTTPError
+from ._cache import (
+    CacheBackend,
+    ResponseCache,
+    ShelveResponseCache,
+    DiskResponseCache,
+    SemanticResponseCache
+)
 from .generic_adapter import GenericAdapter
 
 # Import specialized LLMs
@@ -15,12 +23,14 @@ try:
     from .llm_factory import LLMFactory
 except ImportError:
     # If llm_factory doesn't exist, create a simple inline factory
+    import functools
     from src.config import Config
     
     class LLMFactory:
         """Simple factory for creating LLM instances."""
         
         @staticmethod
+        @functools.lru_cache(maxsize=8)
         def create_llm(model_name=None):
             model_name = model_name or Config.ORCHESTRATOR_MODEL
             config = Config.get_model_config(model_name)
@@ -45,10 +55,21 @@ except ImportError:
                 Config.ORCHESTRATOR_MODEL: {'role': 'orchestrator'},
                 Config.CODEWRITER_MODEL: {'role': 'code_writer'}
             }
+        
+        @staticmethod
+        def invalidate_model_cache():
+            LLMFactory.create_llm.cache_clear()
 
 __all__ = [
     'LLMInterface',
     'GenericAdapter',
+    'LLMHTTPError',
+    'EmptyResponseError',
+    'CacheBackend',
+    'ResponseCache',
+    'ShelveResponseCache',
+    'DiskResponseCache',
+    'SemanticResponseCache',
     'OrchestratorLLM',
     'CodeWriter',
     'LLMFactory'
@@ -0,0 +1,72 @@
+"""Optional aiohttp path for async OpenAI-compatible chat requests.
+
+httpx.AsyncClient loses throughput once many requests are in flight, so
+when aiohttp is installed GenericLLM sends wide async fan-outs (CodeWriter
+temperatures, batched decisions) through a session from this module.
+"""
+
+import asyncio
+import importlib.util
+from typing import TYPE_CHECKING, Any, Dict, Tuple
+
+if TYPE_CHECKING:
+    import aiohttp
+
+# aiohttp takes ~100ms to import, so it is only imported when the first
+# session is created, not when src.llms is
+AVAILABLE = importlib.util.find_spec("aiohttp") is not None
+
+# Same ceiling as the httpx pool; requests beyond it queue in the connector
+MAX_CONNECTIONS = 64
+
+
+class TransportError(RuntimeError):
+    """A request failed before any HTTP response was received."""
+
+
+def new_session(timeout: float, connect_timeout: float):
+    """Create a pooled session bound to the running event loop.
+
+    Args:
+        timeout: Total seconds allowed per request
+        connect_timeout: Seconds allowed to establish a connection
+
+    Returns:
+        aiohttp.ClientSession with keep-alive connections
+    """
+    import aiohttp
+    
+    return aiohttp.ClientSession(
+        timeout=aiohttp.ClientTimeout(total=timeout, connect=connect_timeout),
+        connector=aiohttp.TCPConnector(limit=MAX_CONNECTIONS, keepalive_timeout=30)
+    )
+
+
+async def post_chat(
+    session: "aiohttp.ClientSession",
+    url: str,
+    headers: Dict[str, str],
+    json_body: Dict[str, Any]
+) -> Tuple[int, bytes]:
+    """POST a chat completion request.
+
+    Args:
+        session: Session from new_session()
+        url: Chat completions endpoint
+        headers: Request headers (auth, content type)
+        json_body: Request payload
+
+    Returns:
+        (HTTP status, raw response body); decoding and status handling are
+        left to the caller so they match the httpx path
+        
+    Raises:
+        TransportError: On connection errors and timeouts
+    """
+    import aiohttp
+    
+    try:
+        async with session.post(url, json=json_body, headers=headers) as response:
+            return response.status, await response.read()
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        raise TransportError(repr(e)) from e
@@ -0,0 +1,308 @@
+"""Response caches shared by the high-level LLM wrappers."""
+
+import hashlib
+import importlib.util
+import json
+import os
+import shelve
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Protocol, Sequence
+
+try:
+    import diskcache
+except ImportError:
+    diskcache = None
+
+
+def make_cache_key(
+    model_name: str,
+    system_prompt: Optional[str],
+    temperature: float,
+    max_tokens: Optional[int],
+    prompt: str,
+    **extra: Any
+) -> str:
+    """Build a stable SHA-256 key for one generation request.
+
+    Args:
+        model_name: Model the request is sent to
+        system_prompt: System prompt (None if absent)
+        temperature: Sampling temperature
+        max_tokens: Token limit (None for the provider default)
+        prompt: User prompt
+        **extra: Any other generation parameters that change the output
+
+    Returns:
+        Hex digest identifying the request
+    """
+    extras = "|".join(f"{k}={extra[k]!r}" for k in sorted(extra))
+    raw = f"{model_name}|{system_prompt}|{temperature}|{max_tokens}|{extras}|{prompt}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class CacheBackend(Protocol):
+    """Interface shared by the key-value response caches.
+
+    ResponseCache, ShelveResponseCache and DiskResponseCache all satisfy
+    it; anything else with these methods can be passed in their place.
+    """
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response for key, or None."""
+
+    def put(self, key: str, value: str) -> None:
+        """Store a response under key."""
+
+    def close(self) -> None:
+        """Release any resources held by the cache."""
+
+
+class ResponseCache:
+    """Thread-safe in-memory LRU cache mapping request keys to responses."""
+
+    def __init__(self, maxsize: int = 1024):
+        """Initialize cache.
+
+        Args:
+            maxsize: Maximum number of responses kept (0 disables caching)
+        """
+        self.maxsize = maxsize
+        self._data: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response for key, or None."""
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: str) -> None:
+        """Store a response, evicting the least recently used entries."""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop every cached response."""
+        with self._lock:
+            self._data.clear()
+
+    def close(self) -> None:
+        """Release any resources held by the cache."""
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class ShelveResponseCache(ResponseCache):
+    """ResponseCache backed by a shelve file so entries survive restarts.
+
+    The in-memory LRU still serves hot keys; the shelf is only read on a
+    memory miss and written on every put.
+    """
+
+    def __init__(self, path: str, maxsize: int = 1024):
+        """Initialize cache.
+
+        Args:
+            path: Shelve file path (shelve may add its own extension)
+            maxsize: Maximum number of responses kept in memory
+        """
+        super().__init__(maxsize)
+        self.path = path
+        self._shelf = shelve.open(path)
+
+    def get(self, key: str) -> Optional[str]:
+        value = super().get(key)
+        if value is None:
+            with self._lock:
+                value = self._shelf.get(key)
+            if value is not None:
+                super().put(key, value)
+        return value
+
+    def put(self, key: str, value: str) -> None:
+        super().put(key, value)
+        with self._lock:
+            self._shelf[key] = value
+
+    def clear(self) -> None:
+        super().clear()
+        with self._lock:
+            self._shelf.clear()
+
+    def close(self) -> None:
+        with self._lock:
+            self._shelf.close()
+
+
+class DiskResponseCache:
+    """Response cache stored with diskcache, with per-entry expiry.
+
+    Safe to share between threads and processes (e.g. pytest-xdist
+    workers), unlike shelve. Needs the optional diskcache package.
+    """
+
+    def __init__(self, directory: str = ".llm_cache", expire: Optional[float] = 86400):
+        """Initialize cache.
+
+        Args:
+            directory: Cache directory
+            expire: Seconds an entry stays valid (None keeps it forever)
+        """
+        if diskcache is None:
+            raise ImportError("DiskResponseCache requires the 'diskcache' package")
+        self.directory = directory
+        self.expire = expire
+        self._cache = diskcache.Cache(directory)
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response for key, or None."""
+        return self._cache.get(key)
+
+    def put(self, key: str, value: str) -> None:
+        """Store a response until it expires."""
+        self._cache.set(key, value, expire=self.expire)
+
+    def clear(self) -> None:
+        """Drop every cached response."""
+        self._cache.clear()
+
+    def close(self) -> None:
+        """Close the underlying cache files."""
+        self._cache.close()
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+
+class SemanticResponseCache:
+    """Paraphrase-tolerant cache keyed by sentence embeddings.
+    
+    Entries live in namespaces that must match exactly (model, settings
+    and any non-paraphrasable part of the request, e.g. the code being
+    analyzed); within one, a text whose embedding has cosine similarity
+    >= threshold with a stored one gets that entry's response. Needs numpy,
+    plus the optional sentence-transformers package unless an encoder is
+    passed in. Entries are saved to directory on close().
+    """
+    
+    def __init__(
+        self,
+        directory: Optional[str] = ".llm_semcache",
+        threshold: float = 0.92,
+        maxsize: int = 1024,
+        model_name: str = "all-MiniLM-L6-v2",
+        encoder: Optional[Callable[[Sequence[str]], Any]] = None
+    ):
+        """Initialize cache.
+        
+        Args:
+            directory: Where entries are persisted (None keeps them in memory)
+            threshold: Minimum cosine similarity for a hit
+            maxsize: Maximum number of entries kept per namespace
+            model_name: sentence-transformers model used when no encoder
+                is given (all-MiniLM-L6-v2: 384 dimensions, ~90MB)
+            encoder: Callable mapping a list of texts to a 2-D array of
+                embeddings, used instead of sentence-transformers
+        """
+        if importlib.util.find_spec("numpy") is None:
+            raise ImportError("SemanticResponseCache requires the 'numpy' package")
+        import numpy
+        
+        if encoder is None:
+            if importlib.util.find_spec("sentence_transformers") is None:
+                raise ImportError(
+                    "SemanticResponseCache requires the 'sentence-transformers' "
+                    "package (or an encoder)"
+                )
+            from sentence_transformers import SentenceTransformer
+            encoder = SentenceTransformer(model_name).encode
+        
+        self._np = numpy
+        self._encoder = encoder
+        self.directory = directory
+        self.threshold = threshold
+        self.maxsize = maxsize
+        # namespace -> (unit-norm embedding matrix, responses in row order)
+        self._index: Dict[str, Any] = {}
+        self._responses: Dict[str, List[str]] = {}
+        self._lock = threading.Lock()
+        if directory is not None:
+            self._load()
+    
+    def _embed(self, text: str):
+        vector = self._np.asarray(self._encoder([text]), dtype=self._np.float32)[0]
+        norm = self._np.linalg.norm(vector)
+        return vector / norm if norm else vector
+    
+    def get(self, namespace: str, text: str) -> Optional[str]:
+        """Return the response stored for a near-identical text, or None."""
+        with self._lock:
+            if namespace not in self._index:
+                return None
+        vector = self._embed(text)
+        with self._lock:
+            # Inner product of unit vectors is cosine similarity
+            scores = self._index[namespace] @ vector
+            best = int(scores.argmax())
+            if scores[best] >= self.threshold:
+                return self._responses[namespace][best]
+        return None
+    
+    def put(self, namespace: str, text: str, value: str) -> None:
+        """Store a response under the embedding of text."""
+        if self.maxsize <= 0:
+            return
+        vector = self._embed(text)
+        with self._lock:
+            vectors = self._index.get(namespace)
+            responses = self._responses.setdefault(namespace, [])
+            vectors = vector[None, :] if vectors is None else self._np.vstack((vectors, vector))
+            responses.append(value)
+            if len(responses) > self.maxsize:
+                vectors = vectors[1:]
+                del responses[0]
+            self._index[namespace] = vectors
+    
+    def clear(self) -> None:
+        """Drop every cached response."""
+        with self._lock:
+            self._index.clear()
+            self._responses.clear()
+    
+    def close(self) -> None:
+        """Save entries to directory (if any)."""
+        if self.directory is None:
+            return
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            namespaces = sorted(self._index)
+            with open(os.path.join(self.directory, "entries.json"), "w") as f:
+                json.dump({ns: self._responses[ns] for ns in namespaces}, f)
+            self._np.savez(
+                os.path.join(self.directory, "vectors.npz"),
+                **{f"ns{i}": self._index[ns] for i, ns in enumerate(namespaces)}
+            )
+    
+    def _load(self) -> None:
+        entries_path = os.path.join(self.directory, "entries.json")
+        vectors_path = os.path.join(self.directory, "vectors.npz")
+        if not (os.path.exists(entries_path) and os.path.exists(vectors_path)):
+            return
+        with open(entries_path) as f:
+            entries = json.load(f)
+        with self._np.load(vectors_path) as vectors:
+            for i, ns in enumerate(sorted(entries)):
+                self._index[ns] = vectors[f"ns{i}"]
+                self._responses[ns] = entries[ns]
+    
+    def __len__(self) -> int:
+        return sum(len(responses) for responses in self._responses.values())
@@ -1,19 +1,115 @@
 """Code writer with multi-temperature sampling and validation."""
 
-from typing import List, Dict, Any, Optional
+import ast
+import asyncio
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import functools
+from typing import List, Dict, Any, Optional, Callable
 from .llm_interfaces import LLMInterface
 import re
+import threading
+
+
+DEFAULT_SYSTEM_PROMPT = """You are an expert Python programmer. Generate complete, working code.
+
+Requirements:
+1. Write COMPLETE implementations - no placeholders or TODO comments
+2. Include proper error handling
+3. Add comprehensive docstrings
+4. Ensure code is syntactically correct
+5. DO NOT truncate the code - write the full implementation"""
+
+
+# Fenced markdown code blocks; LLM replies usually wrap code in these
+_FENCE_RE = re.compile(r'```[^\n]*\n(.*?)```', re.DOTALL)
+
+
+def _extract_code(text: str) -> str:
+    """Return the fenced code blocks in text, or text itself if it has none."""
+    if '```' not in text:
+        return text
+    blocks = _FENCE_RE.findall(text)
+    if blocks:
+        return '\n'.join(blocks)
+    # Unclosed fence (typically a truncated reply): take what follows it
+    after_fence = text[text.index('```'):]
+    return after_fence[after_fence.find('\n') + 1:]
+
+
+@functools.lru_cache(maxsize=256)
+def _parses(code: str) -> bool:
+    """Whether code is syntactically valid Python (cached per string)."""
+    try:
+        ast.parse(code)
+    except (SyntaxError, ValueError):
+        return False
+    return True
+
+
+# A partial with no code structure after this many characters (~128
+# tokens) is almost certainly prose, not code
+_PARTIAL_CHECK_CHARS = 512
+_CODE_STRUCTURE_RE = re.compile(r'\b(def|class)\s+\w+|:[ \t]*\n[ \t]+\S')
+
+
+def looks_like_code(partial: str) -> bool:
+    """Default on_partial check: keep streaming while the reply may be code.
+    
+    Returns False (abort) once the partial reply is long enough to judge
+    and still has no def/class and no indented block.
+    """
+    if len(partial) < _PARTIAL_CHECK_CHARS:
+        return True
+    return _CODE_STRUCTURE_RE.search(partial) is not None
+
+
+# Unfenced code is taken as finished when a block closes with one of these
+# and is followed by a blank line
+_TERMINAL_LINE_RE = re.compile(r'(return\b.*|pass)\s*$')
+
+
+def looks_complete(partial: str) -> bool:
+    """stop_when check: the partial reply already holds finished code.
+    
+    Fenced replies are complete once the first code block closes and
+    parses (whatever follows is usually prose). Unfenced ones are complete
+    when they parse, define something, and end with a return/pass line and
+    a blank line; this can cut off code that defines several functions, so
+    it is not the default.
+    """
+    if '```' in partial:
+        match = _FENCE_RE.search(partial)
+        return match is not None and bool(match.group(1).strip()) and _parses(match.group(1))
+    if not partial.endswith('\n\n'):
+        return False
+    last_line = partial.rstrip().rsplit('\n', 1)[-1].strip()
+    return (
+        _TERMINAL_LINE_RE.match(last_line) is not None
+        and _CODE_STRUCTURE_RE.search(partial) is not None
+        and _parses(partial)
+    )
 
 
 class CodeWriter:
     """Generate code with multiple temperature attempts and pick the best."""
     
+    # Truncation heuristics, compiled once. Both are applied to the last
+    # line only; `$` is meant to anchor at the end of the code, so these
+    # must NOT be compiled with re.MULTILINE.
+    _DEF_CLASS_RE = re.compile(r'(def|class)\s+\w+.*:\s*$')
+    _TAIL_ASSIGN_RE = re.compile(r'^[a-zA-Z_].*[=\.]$')
+    
     def __init__(
         self,
         llm: LLMInterface,
         temps: List[float] = [0.3, 0.7, 1.0],
         max_tokens: int = 2000,
-        min_code_length: int = 50
+        min_code_length: int = 50,
+        cache_size: int = 256,
+        early_exit_threshold: Optional[float] = None,
+        on_partial: Optional[Callable[[str], bool]] = None,
+        stop_when: Optional[Callable[[str], bool]] = None
     ):
         """
         Initialize CodeWriter.
@@ -23,16 +119,37 @@ class CodeWriter:
             temps: List of temperatures to try
             max_tokens: Maximum tokens per generation
             min_code_length: Minimum acceptable code length
+            cache_size: Maximum number of good candidates kept in the
+                in-process response cache (0 disables caching)
+            early_exit_threshold: If set, try the lowest temperature first
+                and skip the others when it scores at least this much
+                without errors (None always samples every temperature)
+            on_partial: If set (and the LLM has generate_stream), stream
+                each candidate and call this with the text so far; returning
+                False aborts that generation (see looks_like_code)
+            stop_when: If set (and the LLM has generate_stream), stream each
+                candidate and stop reading it as soon as this returns True
+                for the text so far, keeping that text (see looks_complete)
         """
         self.llm = llm
         self.temps = temps
         self.max_tokens = max_tokens
         self.min_code_length = min_code_length
+        self.cache_size = cache_size
+        self.early_exit_threshold = early_exit_threshold
+        self.on_partial = on_partial
+        self.stop_when = stop_when
+        
+        # LRU of (llm, temp, max_tokens, prompt, system_prompt) -> candidate.
+        # Candidates are produced on worker threads, hence the lock.
+        self._cache: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
     
     def generate_and_pick(
         self,
         prompt: str,
-        system_prompt: Optional[str] = None
+        system_prompt: Optional[str] = None,
+        draft: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Generate code at multiple temperatures and pick the best.
@@ -40,6 +157,9 @@ class CodeWriter:
         Args:
             prompt: Code generation prompt
             system_prompt: Optional system prompt
+            draft: Optional draft solution (e.g. from the cheaper
+                orchestrator model) for the writer to fix and complete
+                rather than writing from scratch
             
         Returns:
             Dictionary with:
@@ -47,66 +167,207 @@ class CodeWriter:
                 - 'candidates': All candidates list
         """
         if system_prompt is None:
-            system_prompt = """You are an expert Python programmer. Generate complete, working code.
+            system_prompt = DEFAULT_SYSTEM_PROMPT
+        prompt = self._with_draft(prompt, draft)
+        
+        if self.early_exit_threshold is None:
+            return self._pick_best(self._run_attempts(prompt, self.temps, system_prompt))
+        
+        # Early exit: the most deterministic temperature alone first, then
+        # fan out to the rest only if it wasn't already good enough
+        temps = sorted(self.temps)
+        candidates = self._run_attempts(prompt, temps[:1], system_prompt)
+        if not self._good_enough(candidates):
+            candidates += self._run_attempts(prompt, temps[1:], system_prompt)
+        
+        return self._pick_best(candidates)
+    
+    async def generate_and_pick_async(
+        self,
+        prompt: str,
+        system_prompt: Optional[str] = None,
+        draft: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Async version of generate_and_pick using asyncio.gather.
+        
+        Uses the LLM's generate_async when it has one, otherwise runs the
+        blocking generate in a worker thread.
+        
+        Args:
+            prompt: Code generation prompt
+            system_prompt: Optional system prompt
+            draft: Optional draft solution to start from
             
-Requirements:
-1. Write COMPLETE implementations - no placeholders or TODO comments
-2. Include proper error handling
-3. Add comprehensive docstrings
-4. Ensure code is syntactically correct
-5. DO NOT truncate the code - write the full implementation"""
+        Returns:
+            Same structure as generate_and_pick
+        """
+        if system_prompt is None:
+            system_prompt = DEFAULT_SYSTEM_PROMPT
+        prompt = self._with_draft(prompt, draft)
+        
+        async def run(temps: List[float]) -> List[Dict[str, Any]]:
+            return list(await asyncio.gather(*(
+                self._one_attempt_async(prompt, temp, system_prompt)
+                for temp in temps
+            )))
+        
+        if self.early_exit_threshold is None:
+            return self._pick_best(await run(self.temps))
+        
+        temps = sorted(self.temps)
+        candidates = await run(temps[:1])
+        if not self._good_enough(candidates):
+            candidates += await run(temps[1:])
+        
+        return self._pick_best(candidates)
+    
+    def generate_and_pick_batched(
+        self,
+        prompt: str,
+        n: int = 3,
+        temperature: float = 0.7,
+        system_prompt: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Draw n samples at one temperature in a single request and pick the best.
+        
+        Trades generate_and_pick's per-temperature diversity for one round
+        trip instead of one per temperature. Needs an LLM whose generate
+        accepts `n` (e.g. GenericAdapter).
+        
+        Args:
+            prompt: Code generation prompt
+            n: Number of samples
+            temperature: Sampling temperature for every sample
+            system_prompt: Optional system prompt
+            
+        Returns:
+            Same structure as generate_and_pick
+        """
+        if system_prompt is None:
+            system_prompt = DEFAULT_SYSTEM_PROMPT
+        
+        try:
+            texts = self.llm.generate(
+                prompt=prompt,
+                temperature=temperature,
+                max_tokens=self.max_tokens,
+                system_prompt=system_prompt,
+                n=n
+            )
+        except Exception as e:
+            return self._pick_best([self._error_candidate(temperature, e)])
+        
+        if isinstance(texts, str):
+            texts = [texts]
         
+        # Samples share one (prompt, temperature) key, so none are cached
         candidates = []
+        for text in texts:
+            try:
+                candidates.append(self._evaluate(None, temperature, text))
+            except Exception as e:
+                candidates.append(self._error_candidate(temperature, e))
+        
+        return self._pick_best(candidates)
+    
+    def evaluate(self, text: str, temperature: float = 0.0) -> Dict[str, Any]:
+        """
+        Score code produced elsewhere (e.g. OrchestratorLLM.plan_and_write).
+        
+        Args:
+            text: Generated code
+            temperature: Temperature it was sampled at, for reporting
+            
+        Returns:
+            Candidate dict with 'temperature', 'text', 'score' and 'error'
+        """
+        return self._evaluate(None, temperature, text)
+    
+    @staticmethod
+    def _with_draft(prompt: str, draft: Optional[str]) -> str:
+        """Append a draft for the writer to refine, if there is one."""
+        if not draft:
+            return prompt
+        return (
+            f"{prompt}\n\n"
+            "DRAFT (from a faster model; keep what is correct, fix and "
+            "complete the rest):\n"
+            f"```python\n{draft.strip()}\n```"
+        )
+    
+    def _run_attempts(
+        self,
+        prompt: str,
+        temps: List[float],
+        system_prompt: Optional[str]
+    ) -> List[Dict[str, Any]]:
+        """Run one attempt per temperature concurrently, in temperature order."""
+        # Adapters with generate_many batch the temperatures themselves
+        # (one n-sample request per distinct temperature)
+        generate_many = getattr(self.llm, 'generate_many', None)
+        if generate_many is not None and not self._streaming:
+            return self._run_attempts_batched(generate_many, prompt, temps, system_prompt)
+        
+        # Each temperature is an independent, I/O-bound request, so run them
+        # concurrently. Results are slotted back in temperature order.
+        candidates = [None] * len(temps)
+        with ThreadPoolExecutor(max_workers=max(1, len(temps))) as ex:
+            futures = {
+                ex.submit(self._one_attempt, prompt, temp, system_prompt): i
+                for i, temp in enumerate(temps)
+            }
+            for future in as_completed(futures):
+                candidates[futures[future]] = future.result()
+        return candidates
+    
+    def _run_attempts_batched(
+        self,
+        generate_many,
+        prompt: str,
+        temps: List[float],
+        system_prompt: Optional[str]
+    ) -> List[Dict[str, Any]]:
+        """Like _run_attempts, but with one generate_many call for cache misses."""
+        keys = [
+            (id(self.llm), temp, self.max_tokens, prompt, system_prompt)
+            for temp in temps
+        ]
+        candidates = [self._cache_get(key) for key in keys]
+        missing = [i for i, c in enumerate(candidates) if c is None]
+        if not missing:
+            return candidates
         
-        # Try each temperature
-        for temp in self.temps:
+        try:
+            results = generate_many(
+                prompt=prompt,
+                temps=[temps[i] for i in missing],
+                max_tokens=self.max_tokens,
+                system_prompt=system_prompt
+            )
+        except Exception as e:
+            results = [e] * len(missing)
+        
+        for i, result in zip(missing, results):
+            if isinstance(result, Exception):
+                candidates[i] = self._error_candidate(temps[i], result)
+                continue
             try:
-                text = self.llm.generate(
-                    prompt=prompt,
-                    temperature=temp,
-                    max_tokens=self.max_tokens,
-                    system_prompt=system_prompt
-                )
-                
-                # Validate generation
-                if not text or len(text.strip()) < self.min_code_length:
-                    candidates.append({
-                        'temperature': temp,
-                        'text': text,
-                        'score': 0.0,
-                        'error': f'Code too short ({len(text)} chars)'
-                    })
-                    continue
-                
-                # Check for truncation indicators
-                if self._is_truncated(text):
-                    candidates.append({
-                        'temperature': temp,
-                        'text': text,
-                        'score': 0.3,  # Low score but not zero
-                        'error': 'Code appears truncated'
-                    })
-                    continue
-                
-                # Score the code
-                score = self._score_code(text)
-                
-                candidates.append({
-                    'temperature': temp,
-                    'text': text,
-                    'score': score,
-                    'error': None
-                })
-                
+                candidates[i] = self._evaluate(keys[i], temps[i], result)
             except Exception as e:
-                candidates.append({
-                    'temperature': temp,
-                    'text': '',
-                    'score': 0.0,
-                    'error': str(e)
-                })
-        
-        # Pick best candidate (highest score, non-error first)
+                candidates[i] = self._error_candidate(temps[i], e)
+        return candidates
+    
+    def _good_enough(self, candidates: List[Dict[str, Any]]) -> bool:
+        """Whether any candidate clears the early-exit threshold."""
+        return any(
+            not c.get('error') and c['score'] >= self.early_exit_threshold
+            for c in candidates
+        )
+    
+    def _pick_best(self, candidates: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Pick the best candidate (highest score, non-error first)."""
         valid_candidates = [c for c in candidates if not c.get('error')]
         
         if valid_candidates:
@@ -122,81 +383,311 @@ Requirements:
             'candidates': candidates
         }
     
-    def _is_truncated(self, code: str) -> bool:
+    def _one_attempt(
+        self,
+        prompt: str,
+        temp: float,
+        system_prompt: Optional[str]
+    ) -> Dict[str, Any]:
         """
-        Check if code appears to be truncated.
+        Generate and evaluate a single candidate at one temperature.
+        
+        Args:
+            prompt: Code generation prompt
+            temp: Sampling temperature
+            system_prompt: System prompt
+            
+        Returns:
+            Candidate dict with 'temperature', 'text', 'score' and 'error'
+        """
+        key = (id(self.llm), temp, self.max_tokens, prompt, system_prompt)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+        
+        try:
+            if self._streaming:
+                text = self._stream_attempt(prompt, temp, system_prompt)
+                if text is None:
+                    return {
+                        'temperature': temp,
+                        'text': '',
+                        'score': 0.0,
+                        'error': 'Aborted: partial output did not look like code'
+                    }
+            else:
+                text = self.llm.generate(
+                    prompt=prompt,
+                    temperature=temp,
+                    max_tokens=self.max_tokens,
+                    system_prompt=system_prompt
+                )
+            return self._evaluate(key, temp, text)
+        except Exception as e:
+            return self._error_candidate(temp, e)
+    
+    @property
+    def _streaming(self) -> bool:
+        """Whether attempts are streamed through on_partial/stop_when."""
+        return (
+            (self.on_partial is not None or self.stop_when is not None)
+            and hasattr(self.llm, 'generate_stream')
+        )
+    
+    def _stream_attempt(
+        self,
+        prompt: str,
+        temp: float,
+        system_prompt: Optional[str]
+    ) -> Optional[str]:
+        """Stream one generation, or return None if on_partial aborted it.
+        
+        Stops early (keeping the text so far) once stop_when is satisfied.
+        """
+        partial = ''
+        stream = self.llm.generate_stream(
+            prompt=prompt,
+            temperature=temp,
+            max_tokens=self.max_tokens,
+            system_prompt=system_prompt
+        )
+        try:
+            for chunk in stream:
+                partial += chunk
+                if self.on_partial is not None and not self.on_partial(partial):
+                    return None
+                if self.stop_when is not None and self.stop_when(partial):
+                    break
+        finally:
+            # Closing the generator drops the connection, which stops the
+            # provider decoding the rest of an aborted or finished candidate
+            stream.close()
+        return partial.strip()
+    
+    async def _one_attempt_async(
+        self,
+        prompt: str,
+        temp: float,
+        system_prompt: Optional[str]
+    ) -> Dict[str, Any]:
+        """Async counterpart of _one_attempt."""
+        key = (id(self.llm), temp, self.max_tokens, prompt, system_prompt)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+        
+        kwargs = dict(
+            prompt=prompt,
+            temperature=temp,
+            max_tokens=self.max_tokens,
+            system_prompt=system_prompt
+        )
+        try:
+            generate_async = getattr(self.llm, 'generate_async', None)
+            if generate_async is not None:
+                text = await generate_async(**kwargs)
+            else:
+                text = await asyncio.to_thread(self.llm.generate, **kwargs)
+            return self._evaluate(key, temp, text)
+        except Exception as e:
+            return self._error_candidate(temp, e)
+    
+    def _evaluate(
+        self,
+        key: Optional[tuple],
+        temp: float,
+        text: str
+    ) -> Dict[str, Any]:
+        """Validate and score generated text, caching good candidates.
+        
+        Pass key=None to skip caching.
+        """
+        # Validate generation
+        if not text or len(text.strip()) < self.min_code_length:
+            return {
+                'temperature': temp,
+                'text': text,
+                'score': 0.0,
+                'error': f'Code too short ({len(text)} chars)'
+            }
+        
+        # Check for truncation indicators
+        analysis = self._analyze(text)
+        if analysis['truncated']:
+            return {
+                'temperature': temp,
+                'text': text,
+                'score': 0.3,  # Low score but not zero
+                'error': 'Code appears truncated'
+            }
+        
+        # Score the code
+        candidate = {
+            'temperature': temp,
+            'text': text,
+            'score': self._score_code(text, analysis),
+            'error': None
+        }
+        # Only complete, successful results are worth replaying
+        if key is not None:
+            self._cache_put(key, candidate)
+        return candidate
+    
+    @staticmethod
+    def _error_candidate(temp: float, error: Exception) -> Dict[str, Any]:
+        """Build the candidate recorded when generation raised."""
+        return {
+            'temperature': temp,
+            'text': '',
+            'score': 0.0,
+            'error': str(error)
+        }
+    
+    def _cache_get(self, key: tuple) -> Optional[Dict[str, Any]]:
+        """Return a copy of a cached candidate, or None on a miss."""
+        if self.cache_size <= 0:
+            return None
+        with self._cache_lock:
+            candidate = self._cache.get(key)
+            if candidate is None:
+                return None
+            self._cache.move_to_end(key)
+            return dict(candidate)
+    
+    def _cache_put(self, key: tuple, candidate: Dict[str, Any]) -> None:
+        """Store a candidate, evicting the least recently used entry."""
+        if self.cache_size <= 0:
+            return
+        with self._cache_lock:
+            self._cache[key] = dict(candidate)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+    
+    def _analyze(self, code: str) -> Dict[str, Any]:
+        """
+        Compute every feature used by truncation checks and scoring at once.
         
         Args:
             code: Generated code string
             
         Returns:
-            True if code appears truncated
+            Dictionary with 'syntax_ok', 'brackets_balanced',
+            'has_docstring', 'has_hint', 'has_error_handling', 'has_comment',
+            'length', 'word_count' and 'truncated'
         """
-        code = code.strip()
+        stripped = code.strip()
         
-        # Check for incomplete function/class definitions
-        if re.search(r'(def|class)\s+\w+.*:\s*$', code):
-            return True
+        # Slice off the last line instead of splitting the whole buffer
+        last_line = stripped[stripped.rfind('\n') + 1:].strip()
         
-        # Check for incomplete docstrings
-        if code.count('"""') % 2 != 0:
-            return True
+        # A successful parse proves brackets and docstrings are closed, so
+        # the counting heuristics are only needed when parsing fails
+        syntax_ok = _parses(_extract_code(stripped))
+        if syntax_ok:
+            brackets_balanced = True
+            unclosed_docstring = False
+        else:
+            brackets_balanced = (
+                stripped.count('(') == stripped.count(')')
+                and stripped.count('[') == stripped.count(']')
+                and stripped.count('{') == stripped.count('}')
+            )
+            unclosed_docstring = stripped.count('"""') % 2 != 0
         
-        # Check for incomplete parentheses/brackets
-        if code.count('(') != code.count(')'):
-            return True
-        if code.count('[') != code.count(']'):
-            return True
-        if code.count('{') != code.count('}'):
-            return True
+        truncated = (
+            # Incomplete function/class definition (a header with no body
+            # can only be the last line, so don't scan the whole buffer)
+            bool(self._DEF_CLASS_RE.search(last_line))
+            # Incomplete docstring
+            or unclosed_docstring
+            # Incomplete parentheses/brackets
+            or not brackets_balanced
+            # Trailing incomplete statement
+            or bool(
+                last_line
+                and not last_line.endswith((':', ',', ')', ']', '}', '"', "'"))
+                and self._TAIL_ASSIGN_RE.match(last_line)
+            )
+        )
         
-        # Check for trailing incomplete statements
-        last_line = code.split('\n')[-1].strip()
-        if last_line and not last_line.endswith((':', ',', ')', ']', '}', '"', "'")):
-            if re.match(r'^[a-zA-Z_].*[=\.]$', last_line):
-                return True
+        return {
+            'syntax_ok': syntax_ok,
+            'brackets_balanced': brackets_balanced,
+            'has_docstring': '"""' in code or "'''" in code,
+            'has_hint': '->' in code or ': ' in code,
+            'has_error_handling': 'try:' in code or 'except' in code or 'raise' in code,
+            'has_comment': '#' in code,
+            'length': len(code),
+            'word_count': len(code.split()),
+            'truncated': truncated,
+        }
+    
+    def _is_truncated(self, code: str) -> bool:
+        """
+        Check if code appears to be truncated.
         
-        return False
+        Args:
+            code: Generated code string
+            
+        Returns:
+            True if code appears truncated
+        """
+        return self._analyze(code)['truncated']
     
-    def _score_code(self, code: str) -> float:
+    def _score_code(
+        self,
+        code: str,
+        analysis: Optional[Dict[str, Any]] = None
+    ) -> float:
         """
         Score generated code quality.
         
         Args:
             code: Code string to score
+            analysis: Result of _analyze(code), computed if not given
             
         Returns:
             Score between 0.0 and 1.0
         """
+        if analysis is None:
+            analysis = self._analyze(code)
+        
         score = 0.5  # Base score
         
+        # Parses as Python (+0.25), otherwise (-0.25)
+        if analysis['syntax_ok']:
+            score += 0.25
+        else:
+            score -= 0.25
+        
         # Has docstrings (+0.1)
-        if '"""' in code or "'''" in code:
+        if analysis['has_docstring']:
             score += 0.1
         
         # Has type hints (+0.1)
-        if '->' in code or ': ' in code:
+        if analysis['has_hint']:
             score += 0.1
         
         # Has error handling (+0.1)
-        if 'try:' in code or 'except' in code or 'raise' in code:
+        if analysis['has_error_handling']:
             score += 0.1
         
         # Has comments (+0.05)
-        if '#' in code:
+        if analysis['has_comment']:
             score += 0.05
         
         # Reasonable length (+0.1 if > 200 chars)
-        if len(code) > 200:
+        if analysis['length'] > 200:
             score += 0.1
         
         # Not too long (-0.1 if approaching max_tokens)
-        estimated_tokens = len(code.split()) * 1.3
+        estimated_tokens = analysis['word_count'] * 1.3
         if estimated_tokens > self.max_tokens * 0.95:
             score -= 0.1
         
         # Complete-looking code (+0.15)
-        if not self._is_truncated(code):
+        if not analysis['truncated']:
             score += 0.15
         
         return min(1.0, max(0.0, score))
@@ -205,7 +696,8 @@ Requirements:
         self,
         prompt: str,
         max_attempts: int = 3,
-        system_prompt: Optional[str] = None
+        system_prompt: Optional[str] = None,
+        draft: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Generate code with retry logic for truncated outputs.
@@ -214,12 +706,13 @@ Requirements:
             prompt: Code generation prompt
             max_attempts: Maximum retry attempts
             system_prompt: Optional system prompt
+            draft: Optional draft solution to start from
             
         Returns:
             Best result after retries
         """
         for attempt in range(max_attempts):
-            result = self.generate_and_pick(prompt, system_prompt)
+            result = self.generate_and_pick(prompt, system_prompt, draft=draft)
             
             # If best is good enough, return it
             best = result['best']
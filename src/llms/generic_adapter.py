@@ -1,9 +1,20 @@
 """Adapter for GenericLLM to maintain interface compatibility."""
 
-from typing import Optional
+import asyncio
+import itertools
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional, Iterator, List, Union, Dict, Any, Sequence, Tuple
+import httpx
+from ._cache import CacheBackend, make_cache_key
 from .generic_llm import GenericLLM
 
 
+# Requests above this temperature are never served from the cache or
+# merged with concurrent identical ones
+_CACHE_MAX_TEMPERATURE = 0.3
+
+
 class GenericAdapter:
     """Adapter that wraps GenericLLM to provide a consistent interface."""
     
@@ -14,7 +25,11 @@ class GenericAdapter:
         base_url: Optional[str] = None,
         provider: Optional[str] = None,
         timeout: int = 60,
-        max_retries: int = 3
+        max_retries: int = 3,
+        cache: Optional[CacheBackend] = None,
+        transport: Optional[httpx.BaseTransport] = None,
+        async_transport: Optional[httpx.AsyncBaseTransport] = None,
+        endpoints: Optional[Sequence[Tuple[str, str]]] = None
     ):
         """Initialize the adapter.
         
@@ -22,30 +37,62 @@ class GenericAdapter:
             model_name: Name of the model
             api_key: API key for authentication (optional if in config)
             base_url: Base URL for the API (optional if in config)
-            provider: Provider name ('gemini', 'openai', 'groq')
+            provider: Provider name ('gemini', 'openai', 'groq', 'anthropic')
             timeout: Request timeout in seconds
             max_retries: Maximum number of retry attempts
+            cache: Optional response cache (any CacheBackend, e.g.
+                DiskResponseCache) for low-temperature, single-sample calls
+            transport: Optional httpx transport for sync requests
+            async_transport: Optional httpx transport for async requests
+            endpoints: Optional (api_key, base_url) pairs to rotate through
+                request by request, spreading load over several keys'
+                rate limits (api_key/base_url default to the first pair)
         """
         # Auto-detect provider if not specified
         if provider is None:
             provider = self._detect_provider(model_name, base_url)
         
+        if endpoints:
+            api_key = api_key or endpoints[0][0]
+            base_url = base_url or endpoints[0][1]
+        else:
+            endpoints = [(api_key, base_url)]
+        
         # Validate required parameters
         if api_key is None:
             raise ValueError(f"api_key is required for {model_name}")
         if base_url is None:
             raise ValueError(f"base_url is required for {model_name}")
         
-        self.llm = GenericLLM(
-            model_name=model_name,
-            api_key=api_key,
-            base_url=base_url,
-            provider=provider,
-            timeout=timeout,
-            max_retries=max_retries
-        )
+        # One GenericLLM per endpoint; they all share the pooled client
+        self._llms = [
+            GenericLLM(
+                model_name=model_name,
+                api_key=endpoint_key,
+                base_url=endpoint_url,
+                provider=provider,
+                timeout=timeout,
+                max_retries=max_retries,
+                transport=transport,
+                async_transport=async_transport
+            )
+            for endpoint_key, endpoint_url in endpoints
+        ]
+        # Each endpoint retries on the others, in rotation order
+        for i, llm in enumerate(self._llms):
+            llm._peers = self._llms[i:] + self._llms[:i]
+        self.llm = self._llms[0]
+        self._llm_cycle = itertools.cycle(self._llms)
+        self._llm_cycle_lock = threading.Lock()
         self.model_name = model_name
         self.provider = provider
+        self.cache = cache
+        
+        # In-flight requests by key: identical concurrent deterministic calls
+        # wait for the first one instead of sending their own (single-flight)
+        self._inflight: Dict[str, Future] = {}
+        self._inflight_async: Dict[str, asyncio.Future] = {}
+        self._inflight_lock = threading.Lock()
     
     @staticmethod
     def _detect_provider(model_name: str, base_url: Optional[str] = None) -> str:
@@ -54,6 +101,8 @@ class GenericAdapter:
         
         if "gemini" in model_lower:
             return "gemini"
+        elif "claude" in model_lower or (base_url and "anthropic" in base_url.lower()):
+            return "anthropic"
         elif "gpt" in model_lower or "openai" in model_lower:
             return "openai"
         elif base_url and "groq" in base_url.lower():
@@ -70,24 +119,282 @@ class GenericAdapter:
         temperature: float = 0.7,
         max_tokens: int = 2000,
         **kwargs
-    ) -> str:
+    ) -> Union[str, List[str]]:
         """Generate text using the underlying LLM.
         
         Args:
             prompt: Input prompt
             temperature: Sampling temperature
             max_tokens: Maximum tokens to generate
+            **kwargs: Additional parameters (e.g., system_prompt, stream, n)
+            
+        Returns:
+            Generated text, or a list of texts when n > 1
+        """
+        if not self._deterministic(temperature, kwargs):
+            # Samples must stay independent: no cache, no merging
+            return self._next_llm().generate(
+                prompt=prompt,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                **kwargs
+            )
+        
+        key = self._request_key(prompt, temperature, max_tokens, kwargs)
+        cacheable = self.cache is not None
+        if cacheable:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+        
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+        if not leader:
+            return self._copy(future.result())
+        
+        try:
+            result = self._next_llm().generate(
+                prompt=prompt,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                **kwargs
+            )
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            if cacheable and isinstance(result, str):
+                self.cache.put(key, result)
+            return result
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+    
+    def generate_many(
+        self,
+        prompt: str,
+        temps: List[float],
+        max_tokens: int = 2000,
+        **kwargs
+    ) -> List[Union[str, Exception]]:
+        """Generate one sample per temperature with as few requests as possible.
+        
+        Repeated temperatures are folded into a single n-sample request, so
+        the shared prompt is only prefilled once; distinct temperatures are
+        requested concurrently over the pooled connection.
+        
+        Args:
+            prompt: Input prompt
+            temps: One sampling temperature per wanted sample
+            max_tokens: Maximum tokens to generate
             **kwargs: Additional parameters (e.g., system_prompt)
             
         Returns:
-            Generated text
+            One entry per temperature, in order: the generated text, or the
+            exception that request raised
         """
-        return self.llm.generate(
+        groups: Dict[float, List[int]] = {}
+        for i, temp in enumerate(temps):
+            groups.setdefault(temp, []).append(i)
+        
+        def run(temp: float, indices: List[int]) -> List[Union[str, Exception]]:
+            try:
+                texts = self.generate(
+                    prompt=prompt,
+                    temperature=temp,
+                    max_tokens=max_tokens,
+                    n=len(indices),
+                    **kwargs
+                )
+            except Exception as e:
+                return [e] * len(indices)
+            if isinstance(texts, str):
+                texts = [texts]
+            missing = len(indices) - len(texts)
+            if missing > 0:
+                texts += [RuntimeError("Provider returned fewer samples than requested")] * missing
+            return texts
+        
+        results: List[Union[str, Exception]] = [None] * len(temps)
+        if not groups:
+            return results
+        with ThreadPoolExecutor(max_workers=len(groups)) as ex:
+            futures = {
+                ex.submit(run, temp, indices): indices
+                for temp, indices in groups.items()
+            }
+            for future, indices in futures.items():
+                for i, text in zip(indices, future.result()):
+                    results[i] = text
+        return results
+    
+    async def generate_async(
+        self,
+        prompt: str,
+        temperature: float = 0.7,
+        max_tokens: int = 2000,
+        **kwargs
+    ) -> Union[str, List[str]]:
+        """Generate text using the underlying LLM without blocking.
+        
+        Args:
+            prompt: Input prompt
+            temperature: Sampling temperature
+            max_tokens: Maximum tokens to generate
+            **kwargs: Additional parameters (e.g., system_prompt, n)
+            
+        Returns:
+            Generated text, or a list of texts when n > 1
+        """
+        if not self._deterministic(temperature, kwargs):
+            return await self._next_llm().generate_async(
+                prompt=prompt,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                **kwargs
+            )
+        
+        key = self._request_key(prompt, temperature, max_tokens, kwargs)
+        cacheable = self.cache is not None
+        if cacheable:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+        
+        future = self._inflight_async.get(key)
+        if future is not None and future.get_loop() is asyncio.get_running_loop():
+            # shield: a cancelled follower must not cancel the leader
+            return self._copy(await asyncio.shield(future))
+        
+        future = asyncio.get_running_loop().create_future()
+        self._inflight_async[key] = future
+        try:
+            result = await self._next_llm().generate_async(
+                prompt=prompt,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                **kwargs
+            )
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Followers re-raise it; don't warn if there were none
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            if cacheable and isinstance(result, str):
+                self.cache.put(key, result)
+            return result
+        finally:
+            if self._inflight_async.get(key) is future:
+                del self._inflight_async[key]
+    
+    def generate_choice(
+        self,
+        prompt: str,
+        choices: List[str],
+        temperature: float = 0.0,
+        **kwargs
+    ) -> str:
+        """Pick one of a fixed set of short answers with a minimal decode.
+        
+        Args:
+            prompt: Input prompt asking for one of the choices
+            choices: Allowed answers (e.g. ["1", "2", "3"])
+            temperature: Sampling temperature
+            **kwargs: Additional parameters (e.g., system_prompt)
+            
+        Returns:
+            The selected choice
+            
+        Raises:
+            ValueError: If the reply is empty or not one of the choices
+        """
+        return self._next_llm().generate_choice(
+            prompt=prompt,
+            choices=choices,
+            temperature=temperature,
+            **kwargs
+        )
+    
+    def generate_stream(
+        self,
+        prompt: str,
+        temperature: float = 0.7,
+        max_tokens: int = 2000,
+        **kwargs
+    ) -> Iterator[str]:
+        """Stream text from the underlying LLM chunk by chunk.
+        
+        Args:
+            prompt: Input prompt
+            temperature: Sampling temperature
+            max_tokens: Maximum tokens to generate
+            **kwargs: Additional parameters (e.g., system_prompt)
+            
+        Yields:
+            Text chunks; close the generator to abort the generation
+        """
+        return self._next_llm().generate_stream(
             prompt=prompt,
             temperature=temperature,
             max_tokens=max_tokens,
             **kwargs
         )
     
+    def warmup(self) -> bool:
+        """Open a pooled connection ahead of the first generation.
+        
+        Returns:
+            True if every endpoint answered its warm-up request
+        """
+        return all([llm.warmup() for llm in self._llms])
+    
+    def _next_llm(self) -> GenericLLM:
+        """The endpoint's GenericLLM to send the next request to."""
+        if len(self._llms) == 1:
+            return self.llm
+        with self._llm_cycle_lock:
+            return next(self._llm_cycle)
+    
+    def _request_key(
+        self,
+        prompt: str,
+        temperature: float,
+        max_tokens: int,
+        kwargs: Dict[str, Any]
+    ) -> str:
+        """Key identifying a request, shared with the response caches."""
+        extra = {k: v for k, v in kwargs.items() if k != 'system_prompt'}
+        return make_cache_key(
+            self.model_name,
+            kwargs.get('system_prompt'),
+            temperature,
+            max_tokens,
+            prompt,
+            **extra
+        )
+    
+    @staticmethod
+    def _deterministic(temperature: float, kwargs: Dict[str, Any]) -> bool:
+        """Whether a request may be cached or share another's reply.
+        
+        Only near-deterministic, single-sample requests: replaying one
+        sample for a high temperature would defeat the point of sampling.
+        """
+        return temperature <= _CACHE_MAX_TEMPERATURE and kwargs.get('n', 1) == 1
+    
+    @staticmethod
+    def _copy(result: Union[str, List[str]]) -> Union[str, List[str]]:
+        """Give each coalesced caller its own list of samples."""
+        return list(result) if isinstance(result, list) else result
+    
     def __repr__(self):
         return f"GenericAdapter(model={self.model_name}, provider={self.provider})"
\ No newline at end of file
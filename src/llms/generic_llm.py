@@ -1,8 +1,125 @@
 """Generic LLM wrapper with support for multiple providers."""
 
-import requests
+import asyncio
+import importlib.util
+import json
+import logging
+import random
+import threading
+import httpx
 import time
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, AsyncIterator, Awaitable, Callable, Iterator, List, Union
+from urllib.parse import urlencode
+
+from . import _aiohttp_transport
+
+logger = logging.getLogger(__name__)
+
+# orjson decodes response bodies several times faster than the stdlib;
+# both accept the raw bytes of the body.
+try:
+    from orjson import loads as _json_loads
+except ImportError:
+    _json_loads = json.loads
+
+# httpx only negotiates HTTP/2 when the optional `h2` package is present
+_HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# Anthropic Messages API version header
+_ANTHROPIC_VERSION = "2023-06-01"
+
+# Connection pool per client: up to 64 concurrent connections, 32 kept
+# alive for reuse (httpx's analogue of a per-host idle pool size)
+_POOL_LIMITS = httpx.Limits(
+    max_keepalive_connections=32,
+    max_connections=64,
+    keepalive_expiry=30
+)
+
+
+def _gemini_schema(schema: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert a JSON Schema into Gemini's responseSchema (OpenAPI subset).
+    
+    Type names are upper-cased and keywords Gemini rejects (e.g.
+    additionalProperties) are dropped.
+    """
+    converted: Dict[str, Any] = {}
+    for key, value in schema.items():
+        if key == "type":
+            converted[key] = value.upper()
+        elif key == "properties":
+            converted[key] = {name: _gemini_schema(sub) for name, sub in value.items()}
+        elif key == "items":
+            converted[key] = _gemini_schema(value)
+        elif key in ("required", "enum", "description", "nullable", "format"):
+            converted[key] = value
+    return converted
+
+
+# One sync client for the whole process, so every GenericLLM (the factory
+# builds one per model) reuses the same warm sockets. Built on first use.
+_SHARED_CLIENT: Optional[httpx.Client] = None
+_SHARED_CLIENT_LOCK = threading.Lock()
+
+
+def _shared_client() -> httpx.Client:
+    """Return the process-wide pooled client, creating it if needed."""
+    global _SHARED_CLIENT
+    with _SHARED_CLIENT_LOCK:
+        if _SHARED_CLIENT is None or _SHARED_CLIENT.is_closed:
+            _SHARED_CLIENT = httpx.Client(
+                http2=_HTTP2_AVAILABLE,
+                timeout=httpx.Timeout(60.0, connect=10.0),
+                limits=_POOL_LIMITS
+            )
+        return _SHARED_CLIENT
+
+
+class LLMHTTPError(RuntimeError):
+    """Raised when a provider answers with a non-200 HTTP status."""
+    
+    def __init__(self, provider: str, status_code: int, body: str):
+        """Initialize the error.
+        
+        Args:
+            provider: Provider label used in the message (e.g., 'Gemini')
+            status_code: HTTP status code of the response
+            body: Response body text
+        """
+        super().__init__(f"{provider} API error {status_code}: {body}")
+        self.status_code = status_code
+        self.body = body
+    
+    @property
+    def retryable(self) -> bool:
+        """Client errors other than 429 (rate limit) will fail again."""
+        return not (400 <= self.status_code < 500 and self.status_code != 429)
+
+
+class EmptyResponseError(RuntimeError):
+    """Raised when a provider answers 200 but returns no text."""
+
+
+async def _close_on_shutdown(aclose: Callable[[], Awaitable[Any]]) -> AsyncIterator[None]:
+    """Async generator that awaits aclose() when it is finalized."""
+    try:
+        yield
+    finally:
+        await aclose()
+
+
+def _close_with_loop(aclose: Callable[[], Awaitable[Any]]) -> AsyncIterator[None]:
+    """Arrange for aclose() to run when the running event loop shuts down.
+    
+    Pooled connections are bound to the loop that opened them and cannot be
+    closed from a later one. asyncio.run() finalizes outstanding async
+    generators while its loop is still open, so a started generator is the
+    hook that closes the connections in time. The caller must keep a
+    reference to the returned generator for as long as the resource is used.
+    """
+    closer = _close_on_shutdown(aclose)
+    asyncio.ensure_future(closer.__anext__())
+    return closer
 
 
 class GenericLLM:
@@ -15,7 +132,9 @@ class GenericLLM:
         base_url: str,
         provider: str,
         timeout: int = 60,
-        max_retries: int = 3
+        max_retries: int = 3,
+        transport: Optional[httpx.BaseTransport] = None,
+        async_transport: Optional[httpx.AsyncBaseTransport] = None
     ):
         """Initialize the LLM wrapper.
         
@@ -23,9 +142,12 @@ class GenericLLM:
             model_name: Name of the model (e.g., 'gemini-2.0-flash', 'gpt-4')
             api_key: API key for the provider
             base_url: Base URL for the API
-            provider: Provider name ('gemini', 'openai', 'groq')
+            provider: Provider name ('gemini', 'openai', 'groq', 'anthropic')
             timeout: Request timeout in seconds
             max_retries: Maximum number of retry attempts
+            transport: Optional httpx transport for sync requests (e.g.
+                httpx.MockTransport in tests); defaults to httpx's own
+            async_transport: Optional httpx transport for async requests
         """
         self.model_name = model_name
         self.api_key = api_key
@@ -33,31 +155,264 @@ class GenericLLM:
         self.provider = provider.lower()
         self.timeout = timeout
         self.max_retries = max_retries
+        self._async_transport = async_transport
+        
+        # Endpoints tried in turn by the retry loops, starting with this one.
+        # GenericAdapter adds its other endpoints, so a retry after a 429
+        # goes to a different key instead of back to the throttled one.
+        self._peers: List["GenericLLM"] = [self]
         
         # Validate provider
-        if self.provider not in ['gemini', 'openai', 'groq']:
+        if self.provider not in ['gemini', 'openai', 'groq', 'anthropic']:
             raise ValueError(f"Unsupported provider: {provider}")
+        
+        # Pooled client so HTTPS connections are kept alive and reused
+        # across calls instead of paying a TCP+TLS handshake per request.
+        # Over HTTP/2, concurrent generations (e.g. CodeWriter's parallel
+        # temperatures) are multiplexed on a single connection.
+        # All instances share one client; only a custom transport gets its
+        # own. The timeout is passed per request since it is per instance.
+        # Retries are handled by _generate_with_retry, not the transport.
+        self._timeout = httpx.Timeout(timeout, connect=min(10.0, timeout))
+        self._owns_client = transport is not None
+        if self._owns_client:
+            self._client = httpx.Client(
+                http2=_HTTP2_AVAILABLE,
+                timeout=self._timeout,
+                limits=_POOL_LIMITS,
+                transport=transport
+            )
+        else:
+            self._client = _shared_client()
+        
+        # Async client is created lazily, and per event loop because httpx
+        # connections cannot be shared across loops (see _get_async_client)
+        self._async_client: Optional[httpx.AsyncClient] = None
+        self._async_client_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._async_client_closer = None
+        
+        # OpenAI-compatible async requests go through aiohttp when it is
+        # installed (also one session per loop); a custom transport wins
+        self._use_aiohttp = (
+            _aiohttp_transport.AVAILABLE
+            and self.provider in ('openai', 'groq')
+            and async_transport is None
+        )
+        self._aiohttp_session = None
+        self._aiohttp_session_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._aiohttp_session_closer = None
+        
+        # Endpoints and headers are constant for the lifetime of the instance
+        # Gemini format: POST {base_url}/models/{model}:generateContent?key=...
+        # The key is urlencoded so characters such as '+' or '&' survive.
+        gemini_model_url = f"{self.base_url}/models/{self.model_name}"
+        self._gemini_url = (
+            f"{gemini_model_url}:generateContent?" + urlencode({"key": self.api_key})
+        )
+        self._gemini_stream_url = (
+            f"{gemini_model_url}:streamGenerateContent?"
+            + urlencode({"alt": "sse", "key": self.api_key})
+        )
+        self._gemini_headers = {"Content-Type": "application/json"}
+        self._gemini_model_info_url = (
+            f"{gemini_model_url}?" + urlencode({"key": self.api_key})
+        )
+        self._openai_url = f"{self.base_url}/chat/completions"
+        self._openai_headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+        self._anthropic_url = f"{self.base_url}/messages"
+        self._anthropic_headers = {
+            "x-api-key": self.api_key,
+            "anthropic-version": _ANTHROPIC_VERSION,
+            "Content-Type": "application/json"
+        }
     
     def generate(
         self,
         prompt: str,
         temperature: float = 0.7,
         max_tokens: int = 2000,
+        stream: bool = False,
+        n: int = 1,
         **kwargs
-    ) -> str:
+    ) -> Union[str, List[str]]:
         """Generate text from the LLM.
         
         Args:
             prompt: Input prompt
             temperature: Sampling temperature
             max_tokens: Maximum tokens to generate
+            stream: Receive the response as server-sent events and join the
+                chunks, instead of waiting for one buffered JSON body
+            n: Number of samples to draw in a single request (OpenAI `n`,
+                Gemini `candidateCount`); cannot be combined with stream
             **kwargs: Additional provider-specific parameters
             
         Returns:
-            Generated text
+            Generated text, or a list of n texts when n > 1
         """
+        if n > 1:
+            if stream:
+                raise ValueError("stream=True does not support n > 1")
+            kwargs["n"] = n
+        
+        if stream:
+            # generate_stream retries up to the first chunk itself
+            return "".join(self.generate_stream(prompt, temperature, max_tokens, **kwargs)).strip()
+        
         return self._generate_with_retry(
-            lambda p, t, m, **kw: self._generate_internal(p, t, m, **kw),
+            GenericLLM._generate_internal,
+            prompt,
+            temperature,
+            max_tokens,
+            **kwargs
+        )
+    
+    def generate_choice(
+        self,
+        prompt: str,
+        choices: List[str],
+        temperature: float = 0.0,
+        **kwargs
+    ) -> str:
+        """Pick one of a fixed set of short answers with a minimal decode.
+        
+        Gemini constrains the output to the choices with an enum response
+        schema; OpenAI-compatible providers get a token budget just large
+        enough for the longest choice.
+        
+        Args:
+            prompt: Input prompt asking for one of the choices
+            choices: Allowed answers (e.g. ["1", "2", "3"])
+            temperature: Sampling temperature
+            **kwargs: Additional provider-specific parameters
+            
+        Returns:
+            The selected choice, exactly as given in choices
+            
+        Raises:
+            ValueError: If the reply is empty or not one of the choices
+        """
+        kwargs["choices"] = list(choices)
+        # Enum output is a handful of tokens; other providers may prefix
+        # the answer with whitespace, so leave one token of headroom
+        max_tokens = max(len(c) for c in choices) + 1
+        
+        def attempt(llm, p, t, m, **kw):
+            # An empty constrained reply will be empty again; don't retry it
+            try:
+                return llm._generate_internal(p, t, m, **kw)
+            except EmptyResponseError:
+                return ""
+        
+        reply = self._generate_with_retry(
+            attempt,
+            prompt,
+            temperature,
+            max_tokens,
+            **kwargs
+        ).strip().strip('."\'')
+        
+        if reply not in choices:
+            raise ValueError(f"Reply {reply!r} is not one of {choices}")
+        return reply
+    
+    def generate_stream(
+        self,
+        prompt: str,
+        temperature: float = 0.7,
+        max_tokens: int = 2000,
+        **kwargs
+    ) -> Iterator[str]:
+        """Stream generated text chunk by chunk.
+        
+        Closing the returned generator early (or breaking out of the loop
+        consuming it) closes the HTTP connection, which stops the generation
+        upstream. Failures before the first chunk are retried like
+        generate(); none are once streaming has started.
+        
+        Args:
+            prompt: Input prompt
+            temperature: Sampling temperature
+            max_tokens: Maximum tokens to generate
+            **kwargs: Additional provider-specific parameters
+            
+        Yields:
+            Text chunks in the order they are produced
+        """
+        if self.provider == 'gemini':
+            stream_func = GenericLLM._stream_gemini
+        elif self.provider in ['openai', 'groq']:
+            stream_func = GenericLLM._stream_openai_compatible
+        elif self.provider == 'anthropic':
+            stream_func = GenericLLM._stream_anthropic
+        else:
+            raise ValueError(f"Unsupported provider: {self.provider}")
+        return self._stream_with_retry(stream_func, prompt, temperature, max_tokens, **kwargs)
+    
+    def _stream_with_retry(
+        self,
+        stream_func,
+        prompt: str,
+        temperature: float,
+        max_tokens: int,
+        **kwargs
+    ) -> Iterator[str]:
+        """Retry a stream until its first chunk arrives, then pass it through."""
+        last_error = None
+        
+        for attempt in range(self.max_retries):
+            started = False
+            stream = stream_func(self._peer(attempt), prompt, temperature, max_tokens, **kwargs)
+            try:
+                for chunk in stream:
+                    started = True
+                    yield chunk
+                return
+            except LLMHTTPError as e:
+                if started or not e.retryable:
+                    raise
+                last_error = e
+            except Exception as e:
+                # Part of the reply was already consumed; can't start over
+                if started:
+                    raise
+                last_error = e
+            finally:
+                stream.close()
+            
+            if attempt < self.max_retries - 1:
+                time.sleep(self._backoff(attempt, last_error))
+        
+        raise RuntimeError(f"Generation failed after {self.max_retries} attempts: {last_error}") from last_error
+    
+    async def generate_async(
+        self,
+        prompt: str,
+        temperature: float = 0.7,
+        max_tokens: int = 2000,
+        n: int = 1,
+        **kwargs
+    ) -> Union[str, List[str]]:
+        """Generate text from the LLM without blocking the event loop.
+        
+        Args:
+            prompt: Input prompt
+            temperature: Sampling temperature
+            max_tokens: Maximum tokens to generate
+            n: Number of samples to draw in a single request
+            **kwargs: Additional provider-specific parameters
+            
+        Returns:
+            Generated text, or a list of n texts when n > 1
+        """
+        if n > 1:
+            kwargs["n"] = n
+        
+        return await self._generate_with_retry_async(
+            GenericLLM._generate_internal_async,
             prompt,
             temperature,
             max_tokens,
@@ -72,19 +427,70 @@ class GenericLLM:
         max_tokens: int,
         **kwargs
     ) -> str:
-        """Execute generation with retry logic."""
+        """Execute generation with retry logic.
+        
+        generate_func is called as generate_func(llm, prompt, ...) with the
+        endpoint for the attempt, so retries rotate through self._peers.
+        """
         last_error = None
         
         for attempt in range(self.max_retries):
             try:
-                return generate_func(prompt, temperature, max_tokens, **kwargs)
+                return generate_func(self._peer(attempt), prompt, temperature, max_tokens, **kwargs)
+            except LLMHTTPError as e:
+                # Auth/bad-request errors will not succeed on retry
+                if not e.retryable:
+                    raise
+                last_error = e
             except Exception as e:
                 last_error = e
-                if attempt < self.max_retries - 1:
-                    wait_time = 2 ** attempt  # Exponential backoff
-                    print(f"⚠️  Attempt {attempt + 1} failed: {e}")
-                    print(f"   Retrying in {wait_time}s...")
-                    time.sleep(wait_time)
+            
+            if attempt < self.max_retries - 1:
+                time.sleep(self._backoff(attempt, last_error))
+        
+        raise RuntimeError(f"Generation failed after {self.max_retries} attempts: {last_error}") from last_error
+    
+    def _peer(self, attempt: int) -> "GenericLLM":
+        """The endpoint to send a given attempt (0 = first try) to."""
+        return self._peers[attempt % len(self._peers)]
+    
+    @staticmethod
+    def _backoff(attempt: int, error: Exception) -> float:
+        """Report a failed attempt and return how long to wait before the next.
+        
+        Exponential backoff with +/-25% jitter so parallel callers don't
+        retry in lockstep.
+        """
+        wait_time = (2 ** attempt) * random.uniform(0.75, 1.25)
+        print(f"⚠️  Attempt {attempt + 1} failed: {error}")
+        print(f"   Retrying in {wait_time:.1f}s...")
+        return wait_time
+    
+    async def _generate_with_retry_async(
+        self,
+        generate_func,
+        prompt: str,
+        temperature: float,
+        max_tokens: int,
+        **kwargs
+    ) -> str:
+        """Async counterpart of _generate_with_retry."""
+        last_error = None
+        
+        for attempt in range(self.max_retries):
+            try:
+                return await generate_func(
+                    self._peer(attempt), prompt, temperature, max_tokens, **kwargs
+                )
+            except LLMHTTPError as e:
+                if not e.retryable:
+                    raise
+                last_error = e
+            except Exception as e:
+                last_error = e
+            
+            if attempt < self.max_retries - 1:
+                await asyncio.sleep(self._backoff(attempt, last_error))
         
         raise RuntimeError(f"Generation failed after {self.max_retries} attempts: {last_error}") from last_error
     
@@ -100,6 +506,8 @@ class GenericLLM:
             return self._generate_gemini(prompt, temperature, max_tokens, **kwargs)
         elif self.provider in ['openai', 'groq']:
             return self._generate_openai_compatible(prompt, temperature, max_tokens, **kwargs)
+        elif self.provider == 'anthropic':
+            return self._generate_anthropic(prompt, temperature, max_tokens, **kwargs)
         else:
             raise ValueError(f"Unsupported provider: {self.provider}")
     
@@ -111,11 +519,348 @@ class GenericLLM:
         **kwargs
     ) -> str:
         """Generate using Google Gemini API."""
-        # Gemini uses a different URL structure
-        # Format: POST https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent
-        url = f"{self.base_url}/models/{self.model_name}:generateContent?key={self.api_key}"
+        payload = self._build_gemini_payload(prompt, temperature, max_tokens, **kwargs)
+        data = self._post("Gemini", self._gemini_url, self._gemini_headers, payload)
+        return self._parse_gemini_response(data, kwargs.get("n", 1))
+    
+    def _generate_openai_compatible(
+        self,
+        prompt: str,
+        temperature: float,
+        max_tokens: int,
+        **kwargs
+    ) -> str:
+        """Generate using OpenAI-compatible API (OpenAI, Groq, etc.)."""
+        payload = self._build_openai_payload(prompt, temperature, max_tokens, **kwargs)
+        data = self._post(self.provider.upper(), self._openai_url, self._openai_headers, payload)
+        return self._parse_openai_response(data, kwargs.get("n", 1))
+    
+    def _generate_anthropic(
+        self,
+        prompt: str,
+        temperature: float,
+        max_tokens: int,
+        **kwargs
+    ) -> Union[str, List[str]]:
+        """Generate using the Anthropic Messages API.
         
-        # Gemini request format
+        The API has no n parameter, so n > 1 sends one request per sample.
+        """
+        payload = self._build_anthropic_payload(prompt, temperature, max_tokens, **kwargs)
+        texts = [
+            self._parse_anthropic_response(
+                self._post("Anthropic", self._anthropic_url, self._anthropic_headers, payload)
+            )
+            for _ in range(kwargs.get("n", 1))
+        ]
+        return texts if len(texts) > 1 else texts[0]
+    
+    async def _generate_internal_async(
+        self,
+        prompt: str,
+        temperature: float,
+        max_tokens: int,
+        **kwargs
+    ) -> str:
+        """Async counterpart of _generate_internal."""
+        if self.provider == 'gemini':
+            payload = self._build_gemini_payload(prompt, temperature, max_tokens, **kwargs)
+            data = await self._post_async("Gemini", self._gemini_url, self._gemini_headers, payload)
+            return self._parse_gemini_response(data, kwargs.get("n", 1))
+        elif self.provider in ['openai', 'groq']:
+            payload = self._build_openai_payload(prompt, temperature, max_tokens, **kwargs)
+            post = self._post_aiohttp if self._use_aiohttp else self._post_async
+            data = await post(
+                self.provider.upper(), self._openai_url, self._openai_headers, payload
+            )
+            return self._parse_openai_response(data, kwargs.get("n", 1))
+        elif self.provider == 'anthropic':
+            payload = self._build_anthropic_payload(prompt, temperature, max_tokens, **kwargs)
+            responses = await asyncio.gather(*(
+                self._post_async(
+                    "Anthropic", self._anthropic_url, self._anthropic_headers, payload
+                )
+                for _ in range(kwargs.get("n", 1))
+            ))
+            texts = [self._parse_anthropic_response(data) for data in responses]
+            return texts if len(texts) > 1 else texts[0]
+        else:
+            raise ValueError(f"Unsupported provider: {self.provider}")
+    
+    def _post(
+        self,
+        label: str,
+        url: str,
+        headers: Dict[str, str],
+        payload: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """POST a JSON payload and return the decoded JSON response."""
+        try:
+            response = self._client.post(
+                url, json=payload, headers=headers, timeout=self._timeout
+            )
+        except httpx.HTTPError as e:
+            raise RuntimeError(f"{label} API request failed: {e}") from e
+        
+        # Check for errors
+        if response.status_code != 200:
+            raise LLMHTTPError(label, response.status_code, response.text)
+        
+        return _json_loads(response.content)
+    
+    async def _post_async(
+        self,
+        label: str,
+        url: str,
+        headers: Dict[str, str],
+        payload: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Async counterpart of _post."""
+        try:
+            response = await self._get_async_client().post(url, json=payload, headers=headers)
+        except httpx.HTTPError as e:
+            raise RuntimeError(f"{label} API request failed: {e}") from e
+        
+        if response.status_code != 200:
+            raise LLMHTTPError(label, response.status_code, response.text)
+        
+        return _json_loads(response.content)
+    
+    async def _post_aiohttp(
+        self,
+        label: str,
+        url: str,
+        headers: Dict[str, str],
+        payload: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """_post_async over an aiohttp session instead of httpx."""
+        try:
+            status, body = await _aiohttp_transport.post_chat(
+                self._get_aiohttp_session(), url, headers, payload
+            )
+        except _aiohttp_transport.TransportError as e:
+            raise RuntimeError(f"{label} API request failed: {e}") from e
+        
+        if status != 200:
+            raise LLMHTTPError(label, status, body.decode("utf-8", "replace"))
+        
+        return _json_loads(body)
+    
+    def _get_aiohttp_session(self):
+        """Return the aiohttp session bound to the running event loop.
+        
+        The session is closed when its loop shuts down, so replacing it
+        for a new loop does not leak the previous one's connections.
+        """
+        loop = asyncio.get_running_loop()
+        if self._aiohttp_session is None or self._aiohttp_session_loop is not loop:
+            self._aiohttp_session = _aiohttp_transport.new_session(
+                self._timeout.read, self._timeout.connect
+            )
+            self._aiohttp_session_loop = loop
+            self._aiohttp_session_closer = _close_with_loop(self._aiohttp_session.close)
+        return self._aiohttp_session
+    
+    def _get_async_client(self) -> httpx.AsyncClient:
+        """Return the async client bound to the running event loop.
+        
+        Each asyncio.run() call gets a fresh loop, and pooled connections
+        from a previous loop are unusable in it, so the client is rebuilt
+        whenever the loop changes. Each client is closed when its loop
+        shuts down.
+        """
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_client_loop is not loop:
+            self._async_client = httpx.AsyncClient(
+                http2=_HTTP2_AVAILABLE,
+                timeout=self._timeout,
+                limits=_POOL_LIMITS,
+                transport=self._async_transport
+            )
+            self._async_client_loop = loop
+            self._async_client_closer = _close_with_loop(self._async_client.aclose)
+        return self._async_client
+    
+    @staticmethod
+    def _parse_gemini_response(data: Dict[str, Any], n: int = 1) -> Union[str, List[str]]:
+        """Extract the generated text(s) from a Gemini response."""
+        if "candidates" not in data or not data["candidates"]:
+            raise RuntimeError(f"No candidates in Gemini response: {data}")
+        
+        texts = []
+        for candidate in data["candidates"][:n]:
+            if "content" not in candidate:
+                raise RuntimeError(f"No content in candidate: {candidate}")
+            
+            parts = candidate["content"].get("parts", [])
+            if not parts:
+                raise EmptyResponseError(f"No parts in content: {candidate['content']}")
+            
+            text = parts[0].get("text", "")
+            if not text:
+                raise EmptyResponseError(f"Empty text in response: {parts}")
+            
+            texts.append(text.strip())
+        
+        return texts if n > 1 else texts[0]
+    
+    @staticmethod
+    def _parse_anthropic_response(data: Dict[str, Any]) -> str:
+        """Extract the generated text from an Anthropic Messages response."""
+        usage = data.get("usage", {})
+        logger.debug(
+            "Anthropic usage: input=%s cache_read=%s cache_write=%s output=%s",
+            usage.get("input_tokens"),
+            usage.get("cache_read_input_tokens"),
+            usage.get("cache_creation_input_tokens"),
+            usage.get("output_tokens")
+        )
+        
+        content = data.get("content", [])
+        # Structured output comes back as the input of a forced tool call
+        for block in content:
+            if block.get("type") == "tool_use":
+                return json.dumps(block.get("input", {}))
+        
+        text = "".join(block.get("text", "") for block in content if block.get("type") == "text")
+        if not text:
+            raise EmptyResponseError(f"Empty content in response: {data}")
+        return text.strip()
+    
+    @staticmethod
+    def _parse_openai_response(data: Dict[str, Any], n: int = 1) -> Union[str, List[str]]:
+        """Extract the generated text(s) from an OpenAI-compatible response."""
+        if "choices" not in data or not data["choices"]:
+            raise RuntimeError(f"No choices in response: {data}")
+        
+        texts = []
+        for choice in data["choices"][:n]:
+            message = choice.get("message", {})
+            content = message.get("content", "")
+            
+            if not content:
+                raise EmptyResponseError(f"Empty content in response: {data}")
+            
+            texts.append(content.strip())
+        
+        return texts if n > 1 else texts[0]
+    
+    def _stream_gemini(
+        self,
+        prompt: str,
+        temperature: float,
+        max_tokens: int,
+        **kwargs
+    ) -> Iterator[str]:
+        """Stream using Google Gemini API (server-sent events)."""
+        payload = self._build_gemini_payload(prompt, temperature, max_tokens, **kwargs)
+        
+        try:
+            with self._client.stream(
+                "POST",
+                self._gemini_stream_url,
+                json=payload,
+                headers=self._gemini_headers,
+                timeout=self._timeout
+            ) as response:
+                if response.status_code != 200:
+                    response.read()
+                    raise LLMHTTPError("Gemini", response.status_code, response.text)
+                
+                for data in self._iter_sse_data(response):
+                    for candidate in data.get("candidates", [])[:1]:
+                        for part in candidate.get("content", {}).get("parts", []):
+                            if part.get("text"):
+                                yield part["text"]
+                
+        except httpx.HTTPError as e:
+            raise RuntimeError(f"Gemini API request failed: {e}") from e
+    
+    def _stream_openai_compatible(
+        self,
+        prompt: str,
+        temperature: float,
+        max_tokens: int,
+        **kwargs
+    ) -> Iterator[str]:
+        """Stream using OpenAI-compatible API (server-sent events)."""
+        payload = self._build_openai_payload(prompt, temperature, max_tokens, **kwargs)
+        payload["stream"] = True
+        
+        try:
+            with self._client.stream(
+                "POST",
+                self._openai_url,
+                json=payload,
+                headers=self._openai_headers,
+                timeout=self._timeout
+            ) as response:
+                if response.status_code != 200:
+                    response.read()
+                    raise LLMHTTPError(self.provider.upper(), response.status_code, response.text)
+                
+                for data in self._iter_sse_data(response):
+                    for choice in data.get("choices", [])[:1]:
+                        content = (choice.get("delta") or {}).get("content")
+                        if content:
+                            yield content
+                
+        except httpx.HTTPError as e:
+            raise RuntimeError(f"{self.provider.upper()} API request failed: {e}") from e
+    
+    def _stream_anthropic(
+        self,
+        prompt: str,
+        temperature: float,
+        max_tokens: int,
+        **kwargs
+    ) -> Iterator[str]:
+        """Stream using the Anthropic Messages API (server-sent events)."""
+        payload = self._build_anthropic_payload(prompt, temperature, max_tokens, **kwargs)
+        payload["stream"] = True
+        
+        try:
+            with self._client.stream(
+                "POST",
+                self._anthropic_url,
+                json=payload,
+                headers=self._anthropic_headers,
+                timeout=self._timeout
+            ) as response:
+                if response.status_code != 200:
+                    response.read()
+                    raise LLMHTTPError("Anthropic", response.status_code, response.text)
+                
+                for data in self._iter_sse_data(response):
+                    if data.get("type") == "content_block_delta":
+                        text = data.get("delta", {}).get("text")
+                        if text:
+                            yield text
+                    elif data.get("type") == "message_stop":
+                        return
+                
+        except httpx.HTTPError as e:
+            raise RuntimeError(f"Anthropic API request failed: {e}") from e
+    
+    @staticmethod
+    def _iter_sse_data(response) -> Iterator[Dict[str, Any]]:
+        """Yield the decoded JSON of each `data:` frame in an SSE response."""
+        for line in response.iter_lines():
+            if not line.startswith("data:"):
+                continue
+            data = line[5:].strip()
+            if data == "[DONE]":
+                return
+            yield _json_loads(data)
+    
+    def _build_gemini_payload(
+        self,
+        prompt: str,
+        temperature: float,
+        max_tokens: int,
+        **kwargs
+    ) -> Dict[str, Any]:
+        """Build a Gemini generateContent request body."""
         payload = {
             "contents": [{
                 "parts": [{
@@ -130,66 +875,50 @@ class GenericLLM:
             }
         }
         
-        # Add system instruction if provided
-        if "system_prompt" in kwargs:
+        if kwargs.get("n", 1) > 1:
+            payload["generationConfig"]["candidateCount"] = kwargs["n"]
+        
+        # JSON mode, optionally constrained to a schema
+        response_format = kwargs.get("response_format", {})
+        if response_format.get("type") in ("json_object", "json_schema"):
+            payload["generationConfig"]["responseMimeType"] = "application/json"
+        if response_format.get("type") == "json_schema":
+            payload["generationConfig"]["responseSchema"] = _gemini_schema(
+                response_format["json_schema"]["schema"]
+            )
+        
+        # Constrain the reply to one of a fixed set of strings
+        if "choices" in kwargs:
+            payload["generationConfig"]["responseMimeType"] = "text/x.enum"
+            payload["generationConfig"]["responseSchema"] = {
+                "type": "STRING",
+                "enum": kwargs["choices"]
+            }
+        
+        # System prompt goes in its own field (not merged into the user
+        # turn) so the provider can cache it as a shared prefix; None or
+        # empty means no system prompt
+        if kwargs.get("system_prompt"):
             payload["systemInstruction"] = {
                 "parts": [{
                     "text": kwargs["system_prompt"]
                 }]
             }
         
-        try:
-            response = requests.post(
-                url,
-                json=payload,
-                timeout=self.timeout,
-                headers={"Content-Type": "application/json"}
-            )
-            
-            # Check for errors
-            if response.status_code != 200:
-                error_detail = response.text
-                raise RuntimeError(
-                    f"Gemini API error {response.status_code}: {error_detail}"
-                )
-            
-            # Parse response
-            data = response.json()
-            
-            # Extract text from Gemini response format
-            if "candidates" not in data or not data["candidates"]:
-                raise RuntimeError(f"No candidates in Gemini response: {data}")
-            
-            candidate = data["candidates"][0]
-            if "content" not in candidate:
-                raise RuntimeError(f"No content in candidate: {candidate}")
-            
-            parts = candidate["content"].get("parts", [])
-            if not parts:
-                raise RuntimeError(f"No parts in content: {candidate['content']}")
-            
-            text = parts[0].get("text", "")
-            if not text:
-                raise RuntimeError(f"Empty text in response: {parts}")
-            
-            return text.strip()
-            
-        except requests.exceptions.RequestException as e:
-            raise RuntimeError(f"Gemini API request failed: {e}") from e
+        return payload
     
-    def _generate_openai_compatible(
+    def _build_openai_payload(
         self,
         prompt: str,
         temperature: float,
         max_tokens: int,
         **kwargs
-    ) -> str:
-        """Generate using OpenAI-compatible API (OpenAI, Groq, etc.)."""
-        url = f"{self.base_url}/chat/completions"
-        
+    ) -> Dict[str, Any]:
+        """Build an OpenAI-compatible chat completions request body."""
         # Build messages
         messages = []
-        if "system_prompt" in kwargs:
+        # Dedicated system message, cacheable as a prefix across calls
+        if kwargs.get("system_prompt"):
             messages.append({
                 "role": "system",
                 "content": kwargs["system_prompt"]
@@ -208,49 +937,102 @@ class GenericLLM:
         }
         
         # Add optional parameters
+        if kwargs.get("n", 1) > 1:
+            payload["n"] = kwargs["n"]
         if "top_p" in kwargs:
             payload["top_p"] = kwargs["top_p"]
         if "frequency_penalty" in kwargs:
             payload["frequency_penalty"] = kwargs["frequency_penalty"]
         if "presence_penalty" in kwargs:
             payload["presence_penalty"] = kwargs["presence_penalty"]
+        if "response_format" in kwargs:
+            payload["response_format"] = kwargs["response_format"]
         
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
+        return payload
+    
+    def _build_anthropic_payload(
+        self,
+        prompt: str,
+        temperature: float,
+        max_tokens: int,
+        **kwargs
+    ) -> Dict[str, Any]:
+        """Build an Anthropic Messages request body.
+        
+        A json_schema response_format becomes a forced tool call whose
+        input is the reply; JSON mode and choices have no Messages API
+        equivalent and are left to the prompt (generate_choice still
+        validates the reply).
+        """
+        payload = {
+            "model": self.model_name,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": temperature,
+            "max_tokens": max_tokens,
         }
+        if "top_p" in kwargs:
+            payload["top_p"] = kwargs["top_p"]
+        
+        response_format = kwargs.get("response_format", {})
+        if response_format.get("type") == "json_schema":
+            json_schema = response_format["json_schema"]
+            payload["tools"] = [{
+                "name": json_schema["name"],
+                "description": f"Return the {json_schema['name']} object",
+                "input_schema": json_schema["schema"]
+            }]
+            payload["tool_choice"] = {"type": "tool", "name": json_schema["name"]}
+        
+        # The system prompt is the constant prefix of every request; the
+        # breakpoint has Anthropic cache it server-side (prefixes shorter
+        # than the model's minimum cacheable length are simply not cached)
+        if kwargs.get("system_prompt"):
+            payload["system"] = [{
+                "type": "text",
+                "text": kwargs["system_prompt"],
+                "cache_control": {"type": "ephemeral"}
+            }]
+        
+        return payload
+    
+    def warmup(self) -> bool:
+        """Open a pooled connection ahead of the first generation.
+        
+        Sends a cheap metadata GET (no tokens generated) so DNS, TCP and
+        TLS setup are paid before the user's first request. Best effort:
+        failures are swallowed and reported through the return value.
+        
+        Returns:
+            True if the provider answered with a 2xx status
+        """
+        if self.provider == "gemini":
+            url, headers = self._gemini_model_info_url, self._gemini_headers
+        elif self.provider == "anthropic":
+            url, headers = f"{self.base_url}/models", self._anthropic_headers
+        else:
+            url, headers = f"{self.base_url}/models", self._openai_headers
         
         try:
-            response = requests.post(
-                url,
-                json=payload,
-                headers=headers,
-                timeout=self.timeout
-            )
-            
-            # Check for errors
-            if response.status_code != 200:
-                error_detail = response.text
-                raise RuntimeError(
-                    f"{self.provider.upper()} API error {response.status_code}: {error_detail}"
-                )
-            
-            # Parse response
-            data = response.json()
-            
-            if "choices" not in data or not data["choices"]:
-                raise RuntimeError(f"No choices in response: {data}")
-            
-            message = data["choices"][0].get("message", {})
-            content = message.get("content", "")
-            
-            if not content:
-                raise RuntimeError(f"Empty content in response: {data}")
-            
-            return content.strip()
-            
-        except requests.exceptions.RequestException as e:
-            raise RuntimeError(f"{self.provider.upper()} API request failed: {e}") from e
+            response = self._client.get(url, headers=headers, timeout=self._timeout)
+        except httpx.HTTPError:
+            return False
+        return response.is_success
+    
+    def close(self) -> None:
+        """Close pooled HTTP connections (the shared client stays open)."""
+        if self._owns_client:
+            self._client.close()
+    
+    async def aclose(self) -> None:
+        """Close the async client's pooled connections."""
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+            self._async_client_loop = None
+        if self._aiohttp_session is not None:
+            await self._aiohttp_session.close()
+            self._aiohttp_session = None
+            self._aiohttp_session_loop = None
     
     def __repr__(self):
         return f"GenericLLM(model={self.model_name}, provider={self.provider})"
\ No newline at end of file
@@ -1,10 +1,25 @@
 """Factory for creating LLM instances."""
 
-from typing import Optional, Dict, Any
+import functools
+import os
+from typing import Optional, Dict, Any, Tuple
 from src.config import Config
+from ._cache import CacheBackend, DiskResponseCache, ResponseCache, diskcache
 from .generic_adapter import GenericAdapter
 
 
+@functools.lru_cache(maxsize=1)
+def _test_cache() -> CacheBackend:
+    """Response cache shared by every adapter created under pytest.
+    
+    Persists across runs when diskcache is installed, so deterministic
+    test prompts stop hitting the live provider.
+    """
+    if diskcache is not None:
+        return DiskResponseCache(".llm_cache")
+    return ResponseCache()
+
+
 class LLMFactory:
     """Factory class for creating LLM instances."""
     
@@ -25,7 +40,8 @@ class LLMFactory:
             provider: Provider name (fetched from config if not provided)
             
         Returns:
-            GenericAdapter instance
+            GenericAdapter instance, shared by every caller asking for the
+            same model and settings (don't close() it while others use it)
         """
         # Use default model if not specified
         if model_name is None:
@@ -34,16 +50,41 @@ class LLMFactory:
         # Get config for the model
         config = Config.get_model_config(model_name)
         
+        # Rotate over every configured endpoint unless one was given
+        endpoints = None if api_key or base_url else config['endpoints']
+        if endpoints is not None and len(endpoints) == 1:
+            endpoints = None
+        
         # Use provided values or fall back to config
         api_key = api_key or config['api_key']
         base_url = base_url or config['base_url']
         provider = provider or config['provider']
         
+        # Under pytest, answer repeated deterministic prompts from a cache
+        cache = _test_cache() if os.getenv("PYTEST_CURRENT_TEST") else None
+        
+        # Resolve defaults before the cache lookup so create_llm() and
+        # create_llm(Config.ORCHESTRATOR_MODEL) share one instance
+        return LLMFactory._cached_llm(model_name, api_key, base_url, provider, cache, endpoints)
+    
+    @staticmethod
+    @functools.lru_cache(maxsize=8)
+    def _cached_llm(
+        model_name: str,
+        api_key: str,
+        base_url: str,
+        provider: str,
+        cache: Optional[CacheBackend] = None,
+        endpoints: Optional[Tuple[Tuple[str, str], ...]] = None
+    ) -> GenericAdapter:
+        """Build the GenericAdapter for one fully resolved configuration."""
         return GenericAdapter(
             model_name=model_name,
             api_key=api_key,
             base_url=base_url,
-            provider=provider
+            provider=provider,
+            cache=cache,
+            endpoints=endpoints
         )
     
     @staticmethod
@@ -74,24 +115,38 @@ class LLMFactory:
         Returns:
             Dictionary mapping model names to their configurations
         """
-        models = {}
-        
-        # Get orchestrator model
-        try:
-            models[Config.ORCHESTRATOR_MODEL] = {
-                'provider': Config.get_model_config(Config.ORCHESTRATOR_MODEL)['provider'],
-                'role': 'orchestrator'
-            }
-        except Exception:
-            pass
-        
-        # Get code writer model
-        try:
-            models[Config.CODEWRITER_MODEL] = {
-                'provider': Config.get_model_config(Config.CODEWRITER_MODEL)['provider'],
-                'role': 'code_writer'
-            }
-        except Exception:
-            pass
-        
-        return models
\ No newline at end of file
+        # Copy so callers can't mutate the cached result
+        return {name: dict(info) for name, info in _list_impl().items()}
+    
+    @classmethod
+    def invalidate_model_cache(cls) -> None:
+        """Forget cached model configs, listings and adapters (e.g. after changing Config)."""
+        Config.get_model_config.cache_clear()
+        _list_impl.cache_clear()
+        cls._cached_llm.cache_clear()
+
+
+@functools.lru_cache(maxsize=1)
+def _list_impl() -> Dict[str, Dict[str, Any]]:
+    """Build the model listing; a pure function of the current Config."""
+    models = {}
+    
+    # Get orchestrator model
+    try:
+        models[Config.ORCHESTRATOR_MODEL] = {
+            'provider': Config.get_model_config(Config.ORCHESTRATOR_MODEL)['provider'],
+            'role': 'orchestrator'
+        }
+    except Exception:
+        pass
+    
+    # Get code writer model
+    try:
+        models[Config.CODEWRITER_MODEL] = {
+            'provider': Config.get_model_config(Config.CODEWRITER_MODEL)['provider'],
+            'role': 'code_writer'
+        }
+    except Exception:
+        pass
+    
+    return models
@@ -1,80 +1,239 @@
 """Enhanced Orchestrator LLM with flexible methods for integration."""
 
 import json
-from typing import Dict, Any, List, Optional
+import re
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+from ._cache import CacheBackend, ResponseCache, SemanticResponseCache, make_cache_key
+from .generic_llm import LLMHTTPError, _json_loads
+
+try:
+    from json_repair import loads as _repair_json
+except ImportError:
+    _repair_json = None
+
+# First run of digits in a decide() reply, e.g. "2" in "Option 2."
+_DIGIT_RE = re.compile(r'\d+')
+
+# raw_decode parses one JSON value and reports where it ended
+_JSON_DECODER = json.JSONDecoder()
+_LENIENT_JSON_DECODER = json.JSONDecoder(strict=False)
+
+# Prompt scaffolding. The constant instructions come first and the
+# per-call text last, so every request starts with a byte-identical
+# prefix that provider-side prompt caching can reuse.
+_PLAN_HEADER = """Given the coding request below, create a detailed plan.
+
+Provide a JSON response with:
+1. "task": A clear, specific description of what needs to be coded
+2. "tests": Specific test cases or validation criteria
+3. "constraints": Any technical constraints or requirements
+
+Example format:
+{
+    "task": "Create a function that...",
+    "tests": "Should handle edge cases like...",
+    "constraints": "Must use only standard library..."
+}
+
+USER REQUEST:
+"""
+_PLAN_FOOTER = "\n\nYour response (JSON only):"
+
+# Structured output for plan(), so the reply is valid JSON of this shape
+# where the provider supports schemas (built once; its repr is part of
+# the cache key, so it must not change between calls)
+_PLAN_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "Plan",
+        "schema": {
+            "type": "object",
+            "properties": {
+                "task": {"type": "string"},
+                "tests": {"type": "string"},
+                "constraints": {"type": "string"}
+            },
+            "required": ["task", "tests", "constraints"],
+            "additionalProperties": False
+        }
+    }
+}
+
+_PLAN_AND_WRITE_HEADER = """Given the coding request below, plan it and then write the code.
+
+Provide a JSON response with:
+1. "plan": an object with
+   - "task": A clear, specific description of what needs to be coded
+   - "tests": Specific test cases or validation criteria
+   - "constraints": Any technical constraints or requirements
+2. "code": Complete, working Python code for the task, with proper error
+   handling, docstrings and example usage
+
+USER REQUEST:
+"""
+_PLAN_AND_WRITE_FOOTER = "\n\nYour response (JSON only):"
+
+_DECIDE_HEADER = """Given the context below, choose the best option.
+Respond with ONLY the number of your choice.
+
+CONTEXT:
+"""
+_DECIDE_OPTIONS = "\n\nOPTIONS:\n"
+
+_DECIDE_MANY_HEADER = """For each numbered decision below, choose the best option given its context.
+
+Respond with ONLY a JSON array holding one object per decision, in order,
+with the number of the chosen option, e.g. [{"choice_idx": 2}, {"choice_idx": 1}]
+
+"""
+_DECIDE_MANY_FOOTER = "\n\nYour response (JSON only):"
+
+_ANALYZE_HEADER = """Analyze the code below and answer the question.
+
+CODE:
+```python
+"""
+_ANALYZE_QUESTION = "\n```\n\nQUESTION:\n"
+_ANALYZE_FOOTER = "\n\nYour analysis:"
 
 
 class OrchestratorLLM:
     """High-level planner and reasoning LLM for orchestration."""
     
-    def __init__(self, llm, system_prompt: Optional[str] = None):
+    def __init__(
+        self,
+        llm,
+        system_prompt: Optional[str] = None,
+        cache: Optional[CacheBackend] = None,
+        enable_semantic_cache: bool = False,
+        semantic_cache: Optional[SemanticResponseCache] = None
+    ):
         """Initialize orchestrator.
         
         Args:
             llm: GenericAdapter instance
             system_prompt: System prompt for the orchestrator
+            cache: Response cache for repeated prompts (defaults to an
+                in-memory LRU; pass a ShelveResponseCache to persist it)
+            enable_semantic_cache: Also answer paraphrased reason(),
+                decide() and analyze() requests from a SemanticResponseCache
+                (off by default: hits depend on the embedding model)
+            semantic_cache: SemanticResponseCache to use; implies
+                enable_semantic_cache (default: one under .llm_semcache/)
         """
         self.llm = llm
         self.system_prompt = system_prompt or "You are an expert coding assistant and planner."
+        self.cache = cache if cache is not None else ResponseCache()
+        if semantic_cache is None and enable_semantic_cache:
+            semantic_cache = SemanticResponseCache()
+        self.semantic_cache = semantic_cache
     
-    def plan(self, user_request: str) -> Dict[str, Any]:
+    def plan(self, user_request: str, no_cache: bool = False) -> Dict[str, Any]:
         """Create a structured plan for a coding request.
         
         Args:
             user_request: The user's coding task description
+            no_cache: Skip the response cache and always call the LLM
             
         Returns:
             Dictionary with 'task', 'tests', and 'constraints'
         """
-        prompt = f"""Given this coding request, create a detailed plan.
-
-USER REQUEST:
-{user_request}
-
-Provide a JSON response with:
-1. "task": A clear, specific description of what needs to be coded
-2. "tests": Specific test cases or validation criteria
-3. "constraints": Any technical constraints or requirements
-
-Example format:
-{{
-    "task": "Create a function that...",
-    "tests": "Should handle edge cases like...",
-    "constraints": "Must use only standard library..."
-}}
-
-Your response (JSON only):"""
+        prompt = _PLAN_HEADER + user_request + _PLAN_FOOTER
         
         try:
-            response = self.llm.generate(
-                prompt=prompt,
-                temperature=0.3,
-                max_tokens=1000,
-                system_prompt=self.system_prompt
-            )
+            try:
+                response = self._generate(
+                    prompt,
+                    temperature=0.3,
+                    max_tokens=1000,
+                    no_cache=no_cache,
+                    response_format=_PLAN_RESPONSE_FORMAT
+                )
+            except LLMHTTPError as e:
+                # Provider rejected the schema; rely on the prompt alone
+                if e.retryable:
+                    raise
+                response = self._generate(
+                    prompt,
+                    temperature=0.3,
+                    max_tokens=1000,
+                    no_cache=no_cache
+                )
             
             # Extract JSON from response
-            response = response.strip()
-            if '{' in response:
-                start = response.find('{')
-                end = response.rfind('}') + 1
-                json_str = response[start:end]
-                plan = json.loads(json_str)
-            else:
+            plan = self._decode_object(response)
+            if plan is None:
                 plan = self._create_fallback_plan(user_request)
             
-            # Validate and fill missing fields
-            plan.setdefault('task', user_request)
-            plan.setdefault('tests', 'Test with various inputs')
-            plan.setdefault('constraints', 'Use Python best practices')
-            
-            return plan
+            return self._complete_plan(plan, user_request)
             
         except (json.JSONDecodeError, Exception) as e:
             print(f"⚠️  Planning error: {e}")
             return self._create_fallback_plan(user_request)
     
-    def reason(self, prompt: str, temperature: float = 0.3, **kwargs) -> str:
+    def plan_and_write(
+        self,
+        user_request: str,
+        max_tokens: int = 3000,
+        no_cache: bool = False
+    ) -> Dict[str, Any]:
+        """Plan a coding request and write its code in a single LLM call.
+        
+        Fast path for when one model does both jobs: saves the second
+        round trip and the second prefill of the shared instructions.
+        
+        Args:
+            user_request: The user's coding task description
+            max_tokens: Token budget for the plan and the code together
+            no_cache: Skip the response cache and always call the LLM
+            
+        Returns:
+            Dictionary with 'plan' (same shape as plan()) and 'code' (the
+            generated code, or '' if the reply had none)
+        """
+        prompt = _PLAN_AND_WRITE_HEADER + user_request + _PLAN_AND_WRITE_FOOTER
+        
+        try:
+            try:
+                response = self._generate(
+                    prompt,
+                    temperature=0.3,
+                    max_tokens=max_tokens,
+                    no_cache=no_cache,
+                    response_format={"type": "json_object"}
+                )
+            except LLMHTTPError as e:
+                # Provider rejected JSON mode; rely on the prompt alone
+                if e.retryable:
+                    raise
+                response = self._generate(
+                    prompt,
+                    temperature=0.3,
+                    max_tokens=max_tokens,
+                    no_cache=no_cache
+                )
+            data = self._decode_object(response) or {}
+        except Exception as e:
+            print(f"⚠️  Planning error: {e}")
+            data = {}
+        
+        plan = data.get('plan')
+        if not isinstance(plan, dict):
+            plan = self._create_fallback_plan(user_request)
+        code = data.get('code')
+        
+        return {
+            'plan': self._complete_plan(plan, user_request),
+            'code': code if isinstance(code, str) else ''
+        }
+    
+    def reason(
+        self,
+        prompt: str,
+        temperature: float = 0.3,
+        no_cache: bool = False,
+        **kwargs
+    ) -> str:
         """General reasoning without structured format.
         
         Useful for: decision making, analysis, explanations
@@ -82,15 +241,17 @@ Your response (JSON only):"""
         Args:
             prompt: The reasoning prompt
             temperature: Sampling temperature (lower = more focused)
+            no_cache: Skip the response cache and always call the LLM
             **kwargs: Additional generation parameters
             
         Returns:
             Reasoning response as text
         """
-        return self.llm.generate(
-            prompt=prompt,
+        return self._generate(
+            prompt,
             temperature=temperature,
-            system_prompt=self.system_prompt,
+            no_cache=no_cache,
+            semantic=("reason", prompt),
             **kwargs
         )
     
@@ -98,7 +259,8 @@ Your response (JSON only):"""
         self, 
         options: List[str], 
         context: str,
-        temperature: float = 0.2
+        temperature: float = 0.2,
+        no_cache: bool = False
     ) -> str:
         """Choose the best option given context.
         
@@ -106,70 +268,250 @@ Your response (JSON only):"""
             options: List of possible choices
             context: Context for the decision
             temperature: Sampling temperature
+            no_cache: Skip the response cache and always call the LLM
             
         Returns:
             Selected option (one of the input options)
         """
         options_text = "\n".join(f"{i+1}. {opt}" for i, opt in enumerate(options))
         
-        prompt = f"""Given this context, choose the best option.
-
-CONTEXT:
-{context}
-
-OPTIONS:
-{options_text}
-
-Respond with ONLY the number of your choice (1-{len(options)}).
-Your choice:"""
+        prompt = "".join((
+            _DECIDE_HEADER,
+            context,
+            _DECIDE_OPTIONS,
+            options_text,
+            f"\n\nYour choice (1-{len(options)}):"
+        ))
         
-        response = self.llm.generate(
-            prompt=prompt,
+        # Constrained one-shot choice where the adapter supports it
+        generate_choice = getattr(self.llm, 'generate_choice', None)
+        if generate_choice is not None:
+            choices = [str(i) for i in range(1, len(options) + 1)]
+            try:
+                choice = self._generate(
+                    prompt,
+                    temperature=temperature,
+                    no_cache=no_cache,
+                    call=generate_choice,
+                    semantic=("decide\n" + options_text, context),
+                    choices=choices
+                )
+                return options[int(choice) - 1]
+            except LLMHTTPError as e:
+                # Provider rejected the constrained request; use plain text
+                if e.retryable:
+                    raise
+            except ValueError:
+                pass
+        
+        response = self._generate(
+            prompt,
             temperature=temperature,
             max_tokens=10,
-            system_prompt=self.system_prompt
+            no_cache=no_cache,
+            semantic=("decide\n" + options_text, context)
         )
         
         # Extract number from response
-        try:
-            choice_num = int(''.join(c for c in response if c.isdigit()))
+        match = _DIGIT_RE.search(response)
+        if match:
+            choice_num = int(match.group())
             if 1 <= choice_num <= len(options):
                 return options[choice_num - 1]
-        except (ValueError, IndexError):
-            pass
         
         # Fallback: return first option
         return options[0]
     
-    def analyze(self, code: str, question: str) -> str:
+    def decide_many(
+        self,
+        decisions: Sequence[Tuple[List[str], str]],
+        temperature: float = 0.2,
+        no_cache: bool = False
+    ) -> List[str]:
+        """Make several independent decisions with a single LLM call.
+        
+        Args:
+            decisions: (options, context) pairs, as decide() takes them
+            temperature: Sampling temperature
+            no_cache: Skip the response cache and always call the LLM
+            
+        Returns:
+            One selected option per decision, in order (the first option
+            where the reply is missing or invalid, like decide())
+        """
+        if not decisions:
+            return []
+        
+        blocks = []
+        for n, (options, context) in enumerate(decisions, 1):
+            options_text = "\n".join(f"{i+1}. {opt}" for i, opt in enumerate(options))
+            blocks.append(f"DECISION {n}\nCONTEXT:\n{context}\nOPTIONS:\n{options_text}")
+        prompt = _DECIDE_MANY_HEADER + "\n\n".join(blocks) + _DECIDE_MANY_FOOTER
+        
+        response = self._generate(
+            prompt,
+            temperature=temperature,
+            max_tokens=20 * len(decisions),
+            no_cache=no_cache
+        )
+        
+        try:
+            picks = self._decode_json(response, list) or []
+        except ValueError:
+            picks = []
+        
+        chosen = []
+        for n, (options, _) in enumerate(decisions):
+            pick = picks[n] if n < len(picks) else None
+            idx = pick.get('choice_idx') if isinstance(pick, dict) else pick
+            if isinstance(idx, int) and 1 <= idx <= len(options):
+                chosen.append(options[idx - 1])
+            else:
+                chosen.append(options[0])
+        return chosen
+    
+    def analyze(self, code: str, question: str, no_cache: bool = False) -> str:
         """Analyze code and answer questions about it.
         
         Args:
             code: Code to analyze
             question: Question about the code
+            no_cache: Skip the response cache and always call the LLM
             
         Returns:
             Analysis response
         """
-        prompt = f"""Analyze this code and answer the question.
-
-CODE:
-```python
-{code}
-```
-
-QUESTION:
-{question}
-
-Your analysis:"""
+        prompt = "".join((
+            _ANALYZE_HEADER,
+            code,
+            _ANALYZE_QUESTION,
+            question,
+            _ANALYZE_FOOTER
+        ))
         
-        return self.llm.generate(
-            prompt=prompt,
+        return self._generate(
+            prompt,
             temperature=0.3,
             max_tokens=500,
-            system_prompt=self.system_prompt
+            no_cache=no_cache,
+            semantic=("analyze\n" + code, question)
         )
     
+    def _generate(
+        self,
+        prompt: str,
+        temperature: float,
+        max_tokens: Optional[int] = None,
+        no_cache: bool = False,
+        call=None,
+        semantic: Optional[Tuple[str, str]] = None,
+        **kwargs
+    ) -> str:
+        """Call the LLM with the orchestrator system prompt, via the cache.
+        
+        Identical requests (same model, system prompt, temperature, token
+        limit, extra parameters and prompt) are answered from the cache.
+        call overrides the adapter method used (default: llm.generate).
+        semantic is an (exact part, paraphrasable text) pair for the
+        semantic cache, if enabled; the exact part must identify
+        everything else about the request.
+        """
+        call = call or self.llm.generate
+        if max_tokens is not None:
+            kwargs['max_tokens'] = max_tokens
+        if no_cache:
+            return call(
+                prompt=prompt,
+                temperature=temperature,
+                system_prompt=self.system_prompt,
+                **kwargs
+            )
+        
+        extra = {k: v for k, v in kwargs.items() if k != 'max_tokens'}
+        key = make_cache_key(
+            getattr(self.llm, 'model_name', repr(self.llm)),
+            self.system_prompt,
+            temperature,
+            max_tokens,
+            prompt,
+            **extra
+        )
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        
+        namespace = None
+        if semantic is not None and self.semantic_cache is not None:
+            exact, text = semantic
+            namespace = make_cache_key(
+                getattr(self.llm, 'model_name', repr(self.llm)),
+                self.system_prompt,
+                temperature,
+                max_tokens,
+                exact,
+                **extra
+            )
+            cached = self.semantic_cache.get(namespace, text)
+            if cached is not None:
+                return cached
+        
+        response = call(
+            prompt=prompt,
+            temperature=temperature,
+            system_prompt=self.system_prompt,
+            **kwargs
+        )
+        # Multi-sample (list) responses aren't worth keying on
+        if isinstance(response, str):
+            self.cache.put(key, response)
+            if namespace is not None:
+                self.semantic_cache.put(namespace, semantic[1], response)
+        return response
+    
+    @staticmethod
+    def _decode_object(response: str) -> Optional[Dict[str, Any]]:
+        """Extract the first JSON object from a reply, or None if there is none."""
+        return OrchestratorLLM._decode_json(response, dict)
+    
+    @staticmethod
+    def _decode_json(response: str, kind: type = dict) -> Any:
+        """Extract the first JSON object (kind=dict) or array (kind=list).
+        
+        Returns None if the reply holds no value of that kind; raises
+        ValueError if it does but cannot be decoded or repaired.
+        """
+        opener, closer = ('{', '}') if kind is dict else ('[', ']')
+        response = response.strip()
+        start = response.find(opener)
+        if start == -1:
+            return None
+        try:
+            if start == 0 and response.endswith(closer):
+                # Clean JSON-only reply: one fast parse
+                data = _json_loads(response)
+            else:
+                # Decode the first object and ignore any prose after it
+                data, _ = _JSON_DECODER.raw_decode(response, start)
+        except ValueError:
+            # Almost-JSON is common in long replies: raw newlines inside the
+            # code string (strict=False accepts those), then anything else
+            # json_repair can fix (trailing commas, missing quotes...)
+            try:
+                data, _ = _LENIENT_JSON_DECODER.raw_decode(response, start)
+            except ValueError:
+                if _repair_json is None:
+                    raise
+                data = _repair_json(response[start:])
+        return data if isinstance(data, kind) else None
+    
+    @staticmethod
+    def _complete_plan(plan: Dict[str, Any], user_request: str) -> Dict[str, Any]:
+        """Validate and fill missing plan fields."""
+        plan.setdefault('task', user_request)
+        plan.setdefault('tests', 'Test with various inputs')
+        plan.setdefault('constraints', 'Use Python best practices')
+        return plan
+    
     def _create_fallback_plan(self, user_request: str) -> Dict[str, Any]:
         """Create a basic plan when JSON parsing fails."""
         return {
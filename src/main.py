@@ -1,7 +1,11 @@
 """Main entry point for CodeRover agent with multi-model support."""
 
+import logging
 import sys
 import os
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
 
 # Add project root to Python path
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -9,7 +13,38 @@ if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
 from src.config import Config
-from src.llms import GenericAdapter, OrchestratorLLM, CodeWriter
+from src.llms import (
+    GenericAdapter,
+    OrchestratorLLM,
+    CodeWriter,
+    ResponseCache,
+    ShelveResponseCache,
+)
+from src.llms.code_writer import looks_complete, looks_like_code
+
+logging.basicConfig()
+logger = logging.getLogger("coderover")
+
+# Per-turn failures log a traceback at most once per interval, capped to a
+# few frames, so a persistently failing loop doesn't spend its time
+# formatting stacks
+_TRACEBACK_INTERVAL = 30.0
+_TRACEBACK_FRAMES = 8
+_last_traceback_ts = 0.0
+
+
+def _log_turn_failure(error: Exception) -> None:
+    """Log a failed turn, with a bounded, rate-limited traceback."""
+    global _last_traceback_ts
+    now = time.monotonic()
+    if now - _last_traceback_ts < _TRACEBACK_INTERVAL:
+        logger.error("turn failed: %s", error)
+        return
+    _last_traceback_ts = now
+    frames = traceback.TracebackException.from_exception(
+        error, limit=_TRACEBACK_FRAMES
+    ).format(chain=False)
+    logger.error("turn failed\n%s", "".join(frames).rstrip())
 
 
 def main():
@@ -43,13 +78,24 @@ def main():
             base_url=orchestrator_config['base_url'],
             provider=orchestrator_config['provider'],
             timeout=Config.LLM_TIMEOUT,
-            max_retries=Config.LLM_MAX_RETRIES
+            max_retries=Config.LLM_MAX_RETRIES,
+            endpoints=orchestrator_config['endpoints']
         )
         print(f"✓ Orchestrator LLM: {orchestrator_model} ({orchestrator_config['provider']})")
 
+        if Config.ORCHESTRATOR_CACHE_PATH:
+            orchestrator_cache = ShelveResponseCache(
+                os.path.expanduser(Config.ORCHESTRATOR_CACHE_PATH),
+                maxsize=Config.ORCHESTRATOR_CACHE_SIZE
+            )
+        else:
+            orchestrator_cache = ResponseCache(maxsize=Config.ORCHESTRATOR_CACHE_SIZE)
+
         orchestrator = OrchestratorLLM(
             llm=orchestrator_llm,
-            system_prompt="You are an expert coding assistant and planner."
+            system_prompt="You are an expert coding assistant and planner.",
+            cache=orchestrator_cache,
+            enable_semantic_cache=Config.ORCHESTRATOR_SEMANTIC_CACHE
         )
         print("✓ Orchestrator initialized")
 
@@ -65,17 +111,41 @@ def main():
             base_url=codewriter_config['base_url'],
             provider=codewriter_config['provider'],
             timeout=Config.LLM_TIMEOUT,
-            max_retries=Config.LLM_MAX_RETRIES
+            max_retries=Config.LLM_MAX_RETRIES,
+            endpoints=codewriter_config['endpoints']
         )
         print(f"✓ Code Writer LLM: {codewriter_model} ({codewriter_config['provider']})")
 
         code_writer = CodeWriter(
             llm=codewriter_llm,
             temps=Config.CODE_WRITER_TEMPS,
-            max_tokens=Config.CODE_WRITER_MAX_TOKENS
+            max_tokens=Config.CODE_WRITER_MAX_TOKENS,
+            early_exit_threshold=Config.CODE_WRITER_EARLY_EXIT,
+            on_partial=looks_like_code if Config.CODE_WRITER_STREAM_ABORT else None,
+            stop_when=looks_complete if Config.CODE_WRITER_STOP_WHEN_COMPLETE else None
         )
         print(f"✓ Code Writer initialized with temps: {Config.CODE_WRITER_TEMPS}")
 
+        # One model for both jobs: plan and write in a single request
+        fastpath = None
+        if Config.SINGLE_MODEL_FASTPATH or orchestrator_model == codewriter_model:
+            fastpath = OrchestratorLLM(
+                llm=codewriter_llm,
+                system_prompt="You are an expert coding assistant and planner.",
+                cache=orchestrator_cache
+            )
+            print("✓ Single-request plan+code fast path enabled")
+
+        # Open both providers' connections concurrently so the first
+        # request doesn't pay two sequential TLS handshakes
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            warm = list(pool.map(
+                lambda llm: llm.warmup(),
+                (orchestrator_llm, codewriter_llm)
+            ))
+        if not all(warm):
+            print("⚠️  Could not pre-connect to every provider; continuing anyway")
+
         # Summary
         print("\n" + "="*60)
         print("📊 Model Configuration:")
@@ -85,8 +155,7 @@ def main():
 
     except Exception as e:
         print(f"\n❌ Initialization Error: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("initialization failed")
         sys.exit(1)
 
     # Interactive loop
@@ -94,6 +163,19 @@ def main():
     print("Type 'quit' or 'exit' to stop.")
     print("="*60)
 
+    try:
+        _interactive_loop(
+            orchestrator, code_writer, fastpath, orchestrator_model, codewriter_model
+        )
+    finally:
+        # Flush the persisted response caches, if any
+        orchestrator.cache.close()
+        if orchestrator.semantic_cache is not None:
+            orchestrator.semantic_cache.close()
+
+
+def _interactive_loop(orchestrator, code_writer, fastpath, orchestrator_model, codewriter_model):
+    """Read coding requests until the user quits."""
     while True:
         # Get user input
         print("\n📝 Your coding request:")
@@ -112,9 +194,23 @@ def main():
             continue
 
         try:
-            # Step 1: Generate plan (using orchestrator_model)
-            print(f"\n🧠 Planning with {orchestrator_model}...")
-            plan = orchestrator.plan(user_request)
+            result = None
+            if fastpath is not None:
+                # Fast path: plan and code from one request; fall back to
+                # the code writer below if the code isn't good enough
+                print(f"\n🧠 Planning and coding in one request with {codewriter_model}...")
+                combined = fastpath.plan_and_write(
+                    user_request,
+                    max_tokens=Config.CODE_WRITER_MAX_TOKENS + 1000
+                )
+                plan = combined['plan']
+                candidate = code_writer.evaluate(combined['code'], temperature=0.3)
+                if not candidate.get('error') and candidate['score'] >= 0.6:
+                    result = {'best': candidate, 'candidates': [candidate]}
+            else:
+                # Step 1: Generate plan (using orchestrator_model)
+                print(f"\n🧠 Planning with {orchestrator_model}...")
+                plan = orchestrator.plan(user_request)
             print(f"\n📋 Plan:")
             print(f"  Task: {plan['task']}")
             if plan.get('tests'):
@@ -122,11 +218,12 @@ def main():
             if plan.get('constraints'):
                 print(f"  Constraints: {plan['constraints']}")
 
-            # Step 2: Generate code (using codewriter_model)
-            print(f"\n💻 Generating code with {codewriter_model}...")
-            print(f"    (testing {len(Config.CODE_WRITER_TEMPS)} temperatures)")
+            if result is None:
+                # Step 2: Generate code (using codewriter_model)
+                print(f"\n💻 Generating code with {codewriter_model}...")
+                print(f"    (testing up to {len(Config.CODE_WRITER_TEMPS)} temperatures)")
             
-            code_prompt = f"""Task: {plan['task']}
+                code_prompt = f"""Task: {plan['task']}
 Constraints: {plan.get('constraints', 'None')}
 Tests: {plan.get('tests', 'None')}
 
@@ -138,11 +235,20 @@ Write complete, working Python code to solve this task. Include:
 
 Code:"""
 
-            # Use retry logic to handle truncated outputs
-            result = code_writer.generate_with_retry(
-                code_prompt,
-                max_attempts=2
-            )
+                draft = None
+                if Config.CODE_WRITER_USE_DRAFT:
+                    print(f"    (drafting with {orchestrator_model})")
+                    draft = orchestrator.reason(
+                        f"Draft Python code for this task. Code only, no prose:\n{plan['task']}",
+                        max_tokens=Config.CODE_WRITER_MAX_TOKENS
+                    )
+
+                # Use retry logic to handle truncated outputs
+                result = code_writer.generate_with_retry(
+                    code_prompt,
+                    max_attempts=2,
+                    draft=draft
+                )
             best = result['best']
 
             # Display best result
@@ -173,8 +279,7 @@ Code:"""
             continue
         except Exception as e:
             print(f"\n❌ Error: {e}")
-            import traceback
-            traceback.print_exc()
+            _log_turn_failure(e)
             print("Please try again with a different request.")
 
 
@@ -0,0 +1,156 @@
+"""Shared pytest configuration for the CodeRover test suite."""
+
+import hashlib
+import json
+import os
+import sys
+
+import httpx
+import pytest
+
+# Add project root to path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from src.config import Config
+from src.llms import GenericAdapter, LLMFactory
+
+
+MOCK_CODE = '''def add(a: int, b: int) -> int:
+    """Return the sum of a and b."""
+    # Reject non-numeric input early
+    try:
+        return a + b
+    except TypeError:
+        raise ValueError("add() expects numbers")
+
+
+print(add(1, 2))'''
+
+
+class MockAdapter(GenericAdapter):
+    """GenericAdapter whose provider is an in-process httpx.MockTransport.
+
+    Requests still go through the real payload building, retry and response
+    parsing code; only the network is replaced. Replies come from
+    canned_responses (keyed by sha256 of the prompt) or, failing that, from
+    a few shape-appropriate defaults (plan JSON, code, choices...). Every
+    request body sent is recorded, decoded, in requests.
+    """
+
+    def __init__(self, model_name: str, provider: str, canned_responses=None):
+        self.canned_responses = canned_responses or {}
+        # Prefixes sent with a cache_control breakpoint (Anthropic only)
+        self.cached_prefixes = set()
+        self.requests = []
+        transport = httpx.MockTransport(self._handle)
+        super().__init__(
+            model_name=model_name,
+            api_key="test-key",
+            base_url="https://mock.invalid/v1",
+            provider=provider,
+            transport=transport,
+            async_transport=transport
+        )
+
+    def _handle(self, request: httpx.Request) -> httpx.Response:
+        if request.method == "GET":
+            return httpx.Response(200, json={})
+        body = json.loads(request.content)
+        self.requests.append(body)
+
+        if self.provider == "gemini":
+            config = body["generationConfig"]
+            prompt = body["contents"][0]["parts"][0]["text"]
+            system = body.get("systemInstruction", {}).get("parts", [{}])[0].get("text")
+            enum = config.get("responseSchema", {}).get("enum")
+            text = enum[0] if enum else self._reply(prompt, system, config["temperature"])
+            return httpx.Response(200, json={"candidates": [
+                {"content": {"parts": [{"text": text}]}}
+                for _ in range(config.get("candidateCount", 1))
+            ]})
+
+        if self.provider == "anthropic":
+            return self._handle_anthropic(body)
+        
+        messages = body["messages"]
+        system = messages[0]["content"] if messages[0]["role"] == "system" else None
+        text = self._reply(messages[-1]["content"], system, body["temperature"])
+        return httpx.Response(200, json={"choices": [
+            {"message": {"content": text}} for _ in range(body.get("n", 1))
+        ]})
+
+    def _handle_anthropic(self, body) -> httpx.Response:
+        """Messages API reply, reporting prompt cache reads like the real one."""
+        cache_read = 0
+        system = None
+        for block in body.get("system", []):
+            system = block["text"]
+            if "cache_control" in block:
+                if block["text"] in self.cached_prefixes:
+                    cache_read += len(block["text"]) // 4
+                self.cached_prefixes.add(block["text"])
+        text = self._reply(body["messages"][-1]["content"], system, body["temperature"])
+        return httpx.Response(200, json={
+            "content": [{"type": "text", "text": text}],
+            "usage": {"input_tokens": 100, "cache_read_input_tokens": cache_read,
+                      "output_tokens": len(text) // 4}
+        })
+    
+    def _reply(self, prompt: str, system_prompt, temperature: float) -> str:
+        canned = self.canned_responses.get(hashlib.sha256(prompt.encode()).hexdigest())
+        if canned is not None:
+            return canned
+        if system_prompt and "calculator" in system_prompt:
+            return "4"
+        if "DECISION 1" in prompt:
+            return json.dumps([{"choice_idx": 1}] * prompt.count("\nDECISION "))
+        if "Your choice" in prompt:
+            return "1"
+        if '"code"' in prompt:
+            return json.dumps({
+                "plan": {"task": "Add two numbers", "tests": "add(1, 2) == 3",
+                         "constraints": "Standard library only"},
+                "code": MOCK_CODE
+            })
+        if "Provide a JSON response" in prompt:
+            return json.dumps({"task": "Add two numbers", "tests": "add(1, 2) == 3",
+                               "constraints": "Standard library only"})
+        if "Code" in prompt or "Write" in prompt:
+            return f"# temp={temperature}\n{MOCK_CODE}"
+        return f"Mock reply to: {prompt[:40]}"
+
+
+def pytest_addoption(parser):
+    """Add the --live switch."""
+    parser.addoption(
+        "--live",
+        action="store_true",
+        default=False,
+        help="run LLM fixtures against the real providers instead of MockAdapter"
+    )
+
+
+@pytest.fixture(scope="session")
+def test_llm(request):
+    """Orchestrator LLM shared by the whole session (one connection pool)."""
+    if request.config.getoption("--live"):
+        return LLMFactory.create_orchestrator()
+    return MockAdapter(Config.ORCHESTRATOR_MODEL, "gemini")
+
+
+@pytest.fixture(scope="session")
+def code_writer_llm(request):
+    """Code writer LLM shared by the whole session."""
+    if request.config.getoption("--live"):
+        return LLMFactory.create_code_writer()
+    return MockAdapter(Config.CODEWRITER_MODEL, "groq")
+
+
+@pytest.fixture
+def anthropic_llm(request):
+    """Anthropic-provider LLM (Messages API) for provider-specific tests."""
+    if request.config.getoption("--live"):
+        return LLMFactory.create_llm(os.getenv("ANTHROPIC_TEST_MODEL", "claude-3-5-haiku-latest"))
+    return MockAdapter("claude-3-5-haiku-latest", "anthropic")
@@ -13,10 +13,13 @@ from src.llms import (
     OrchestratorLLM,
     CodeWriter
 )
+from conftest import MockAdapter
 
 
-def create_test_llm():
-    """Helper to create a test LLM instance."""
+def create_test_llm(live: bool = False):
+    """Helper to create a test LLM instance (mocked unless live)."""
+    if not live:
+        return MockAdapter(Config.ORCHESTRATOR_MODEL, "gemini")
     config = Config.get_model_config(Config.ORCHESTRATOR_MODEL)
     return GenericAdapter(
         model_name=Config.ORCHESTRATOR_MODEL,
@@ -28,6 +31,12 @@ def create_test_llm():
     )
 
 
+@pytest.fixture(scope="session")
+def shared_llm(request):
+    """One LLM (and connection pool) for the whole session; live with --live."""
+    return create_test_llm(request.config.getoption("--live"))
+
+
 class TestGenericAdapter:
     """Tests for GenericAdapter."""
     
@@ -44,9 +53,9 @@ class TestGenericAdapter:
         assert llm.provider == config['provider']
         print(f"✅ Initialized: {llm}")
     
-    def test_generate_basic(self):
+    def test_generate_basic(self, shared_llm):
         """Test basic text generation."""
-        llm = create_test_llm()
+        llm = shared_llm
         response = llm.generate(
             "Say 'test' and nothing else",
             temperature=0.3,
@@ -56,9 +65,9 @@ class TestGenericAdapter:
         assert len(response) > 0
         print(f"✅ Generated: {response[:50]}...")
     
-    def test_generate_with_system_prompt(self):
+    def test_generate_with_system_prompt(self, shared_llm):
         """Test generation with system prompt."""
-        llm = create_test_llm()
+        llm = shared_llm
         response = llm.generate(
             "What is 2+2?",
             temperature=0.1,
@@ -73,9 +82,9 @@ class TestGenericAdapter:
 class TestOrchestratorLLM:
     """Tests for OrchestratorLLM."""
     
-    def test_plan_generation(self):
+    def test_plan_generation(self, shared_llm):
         """Test plan generation."""
-        llm = create_test_llm()
+        llm = shared_llm
         orchestrator = OrchestratorLLM(llm)
         plan = orchestrator.plan("Create a function to add two numbers")
         
@@ -86,9 +95,9 @@ class TestOrchestratorLLM:
         assert len(plan['task']) > 0
         print(f"✅ Plan generated: {plan['task'][:50]}...")
     
-    def test_reason(self):
+    def test_reason(self, shared_llm):
         """Test general reasoning."""
-        llm = create_test_llm()
+        llm = shared_llm
         orchestrator = OrchestratorLLM(llm)
         response = orchestrator.reason(
             "Should I use a list or a dictionary to store key-value pairs?"
@@ -98,9 +107,9 @@ class TestOrchestratorLLM:
         assert len(response) > 0
         print(f"✅ Reasoning: {response[:50]}...")
     
-    def test_decide(self):
+    def test_decide(self, shared_llm):
         """Test decision making."""
-        llm = create_test_llm()
+        llm = shared_llm
         orchestrator = OrchestratorLLM(llm)
         options = ["Use a for loop", "Use list comprehension", "Use map()"]
         context = "Need to transform a list of numbers by doubling them"
@@ -114,9 +123,9 @@ class TestOrchestratorLLM:
 class TestCodeWriter:
     """Tests for CodeWriter."""
     
-    def test_single_generation(self):
+    def test_single_generation(self, shared_llm):
         """Test code generation with single temperature."""
-        llm = create_test_llm()
+        llm = shared_llm
         writer = CodeWriter(llm, temps=[0.5], max_tokens=200)
         result = writer.generate_and_pick("Write: def hello(): pass")
         
@@ -126,9 +135,9 @@ class TestCodeWriter:
         assert isinstance(result['best']['text'], str)
         print(f"✅ Code generated: {result['best']['text'][:50]}...")
     
-    def test_multi_temperature(self):
+    def test_multi_temperature(self, shared_llm):
         """Test code generation with multiple temperatures."""
-        llm = create_test_llm()
+        llm = shared_llm
         writer = CodeWriter(llm, temps=[0.3, 0.7], max_tokens=200)
         result = writer.generate_and_pick("Write: def add(a, b): return a + b")
         
@@ -138,14 +147,14 @@ class TestCodeWriter:
         print(f"✅ Multi-temp code generated, best temp: {result['best']['temperature']}")
 
 
-def test_integration():
+def test_integration(shared_llm, code_writer_llm):
     """Integration test for complete workflow."""
     print("\n" + "="*60)
     print("INTEGRATION TEST: Plan → Generate")
     print("="*60)
     
     # Step 1: Plan
-    llm = create_test_llm()
+    llm = shared_llm
     orchestrator = OrchestratorLLM(llm)
     plan = orchestrator.plan("Create a fibonacci function")
     
@@ -153,16 +162,7 @@ def test_integration():
     assert 'task' in plan
     
     # Step 2: Generate code
-    code_config = Config.get_model_config(Config.CODEWRITER_MODEL)
-    code_llm = GenericAdapter(
-        model_name=Config.CODEWRITER_MODEL,
-        api_key=code_config['api_key'],
-        base_url=code_config['base_url'],
-        provider=code_config['provider'],
-        timeout=60,
-        max_retries=2
-    )
-    writer = CodeWriter(code_llm, temps=[0.5], max_tokens=300)
+    writer = CodeWriter(code_writer_llm, temps=[0.5], max_tokens=300)
     
     prompt = f"Task: {plan['task']}\n\nCode:"
     result = writer.generate_and_pick(prompt)
@@ -180,6 +180,8 @@ if __name__ == "__main__":
     print("\n🧪 Running LLM Component Tests\n")
     
     try:
+        llm = create_test_llm(live="--live" in sys.argv)
+        
         # Test 1
         print("TEST 1: GenericAdapter initialization")
         t = TestGenericAdapter()
@@ -187,21 +189,27 @@ if __name__ == "__main__":
         
         # Test 2
         print("\nTEST 2: Basic generation")
-        t.test_generate_basic()
+        t.test_generate_basic(llm)
         
         # Test 3
         print("\nTEST 3: Orchestrator planning")
         t = TestOrchestratorLLM()
-        t.test_plan_generation()
+        t.test_plan_generation(llm)
         
         # Test 4
         print("\nTEST 4: Code generation")
         t = TestCodeWriter()
-        t.test_single_generation()
+        t.test_single_generation(llm)
         
         # Test 5
         print("\nTEST 5: Integration")
-        test_integration()
+        if "--live" in sys.argv:
+            # Same code writer the code_writer_llm fixture builds with --live
+            from src.llms import LLMFactory
+            code_llm = LLMFactory.create_code_writer()
+        else:
+            code_llm = MockAdapter(Config.CODEWRITER_MODEL, "groq")
+        test_integration(llm, code_llm)
         
         print("\n" + "="*60)
         print("🎉 ALL TESTS PASSED!")
@@ -1,8 +1,17 @@
 """Unit tests for LLM components."""
 
+import asyncio
+import httpx
+import json
+import logging
 import pytest
+import socket
 import sys
 import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
 # Add project root to path
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -17,12 +26,48 @@ from src.llms import (
     CodeWriter,
     LLMFactory
 )
+from src.llms.code_writer import looks_complete
+from src.llms.generic_llm import _gemini_schema
+from src.llms.orchestrator_llm import _PLAN_RESPONSE_FORMAT
+from conftest import MOCK_CODE, MockAdapter
+
+
+class _ChatHandler(BaseHTTPRequestHandler):
+    """Minimal keep-alive OpenAI-style chat endpoint."""
+    
+    protocol_version = "HTTP/1.1"
+    delay = 0.0
+    
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        time.sleep(self.delay)
+        body = json.dumps({"choices": [{"message": {"content": "ok"}}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, *args):
+        pass
+
+
+class _ChatServer(ThreadingHTTPServer):
+    """Threaded server whose listen backlog fits a full connection pool."""
+    
+    daemon_threads = True
+    request_queue_size = 128
 
 
 @pytest.fixture
-def test_llm():
-    """Create a test LLM instance."""
-    return LLMFactory.create_orchestrator()
+def local_server():
+    """Local chat endpoint on an ephemeral port."""
+    server = _ChatServer(("127.0.0.1", 0), _ChatHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/v1"
+    server.shutdown()
+    server.server_close()
 
 
 class TestGenericAdapter:
@@ -40,6 +85,191 @@ class TestGenericAdapter:
         assert llm.model_name == Config.ORCHESTRATOR_MODEL
         assert llm.provider == config['provider']
     
+    def test_stream_retries_before_first_chunk(self):
+        """Test a transient error on a stream is retried like generate()."""
+        statuses = [503, 200]
+        
+        def handler(request):
+            status = statuses.pop(0)
+            if status != 200:
+                return httpx.Response(status, text="unavailable")
+            body = 'data: {"choices": [{"delta": {"content": "ok"}}]}\n\ndata: [DONE]\n\n'
+            return httpx.Response(200, text=body, headers={"Content-Type": "text/event-stream"})
+        
+        llm = GenericAdapter(model_name="model", api_key="test", base_url="https://mock.invalid/v1",
+                             provider="openai", transport=httpx.MockTransport(handler))
+        with mock.patch("src.llms.generic_llm.time.sleep"):
+            chunks = list(llm.generate_stream("ping", temperature=0.7))
+        
+        assert chunks == ["ok"]
+        assert statuses == []
+    
+    def test_stream_generate_retries_once_per_attempt(self):
+        """Test generate(stream=True) makes max_retries requests, not max_retries ** 2."""
+        sent = []
+        
+        def handler(request):
+            sent.append(request)
+            return httpx.Response(503, text="unavailable")
+        
+        llm = GenericAdapter(model_name="model", api_key="test", base_url="https://mock.invalid/v1",
+                             provider="openai", max_retries=3, transport=httpx.MockTransport(handler))
+        with mock.patch("src.llms.generic_llm.time.sleep"):
+            with pytest.raises(RuntimeError, match="after 3 attempts"):
+                llm.generate("ping", temperature=0.7, stream=True)
+        
+        assert len(sent) == 3
+    
+    @pytest.mark.asyncio
+    async def test_single_flight_only_merges_deterministic_calls(self):
+        """Test concurrent sampled calls stay separate; deterministic ones merge."""
+        sent = []
+        
+        async def handler(request):
+            sent.append(request)
+            text = f"sample{len(sent)}"
+            await asyncio.sleep(0.05)
+            return httpx.Response(200, json={"choices": [{"message": {"content": text}}]})
+        
+        llm = GenericAdapter(model_name="model", api_key="test", base_url="https://mock.invalid/v1",
+                             provider="openai", async_transport=httpx.MockTransport(handler))
+        
+        sampled = await asyncio.gather(*(
+            llm.generate_async("ping", temperature=1.0) for _ in range(3)
+        ))
+        assert len(sent) == 3
+        assert len(set(sampled)) == 3
+        
+        sent.clear()
+        merged = await asyncio.gather(*(
+            llm.generate_async("ping", temperature=0.0) for _ in range(3)
+        ))
+        assert len(sent) == 1
+        assert len(set(merged)) == 1
+    
+    def test_connections_are_reused(self, local_server):
+        """Test adapters share one pool instead of reconnecting per call."""
+        llms = [
+            GenericAdapter(model_name=f"model-{i}", api_key="test",
+                           base_url=local_server, provider="openai")
+            for i in range(2)
+        ]
+        connects = []
+        real_connect = socket.socket.connect
+        
+        def counting_connect(sock, address):
+            connects.append(address)
+            return real_connect(sock, address)
+        
+        with mock.patch.object(socket.socket, 'connect', counting_connect):
+            for i in range(10):
+                assert llms[i % 2].generate(f"ping {i}", temperature=0.7) == "ok"
+        
+        assert len(connects) == 1
+    
+    def test_async_session_closed_with_its_loop(self, local_server):
+        """Test each event loop's aiohttp session is closed when the loop ends."""
+        llm = GenericAdapter(model_name="model", api_key="test",
+                             base_url=local_server, provider="openai").llm
+        if not llm._use_aiohttp:
+            pytest.skip("aiohttp is not installed")
+    
+        assert asyncio.run(llm.generate_async("ping", temperature=0.7)) == "ok"
+        first = llm._aiohttp_session
+        assert asyncio.run(llm.generate_async("ping", temperature=0.7)) == "ok"
+    
+        assert llm._aiohttp_session is not first
+        assert first.closed and llm._aiohttp_session.closed
+    
+    def test_async_client_closed_with_its_loop(self):
+        """Test each event loop's httpx client is closed when the loop ends."""
+        transport = httpx.MockTransport(
+            lambda request: httpx.Response(200, json={"choices": [{"message": {"content": "ok"}}]})
+        )
+        llm = GenericAdapter(model_name="model", api_key="test", base_url="https://mock.invalid/v1",
+                             provider="openai", async_transport=transport).llm
+        
+        assert asyncio.run(llm.generate_async("ping", temperature=0.7)) == "ok"
+        first = llm._async_client
+        assert asyncio.run(llm.generate_async("ping", temperature=0.7)) == "ok"
+        
+        assert llm._async_client is not first
+        assert first.is_closed and llm._async_client.is_closed
+    
+    @pytest.mark.asyncio
+    async def test_concurrent_async_throughput(self, local_server):
+        """Test 200 gathered generations overlap instead of running serially."""
+        llm = GenericAdapter(model_name="model", api_key="test",
+                             base_url=local_server, provider="openai")
+        delay, count = 0.05, 200
+        _ChatHandler.delay = delay
+        try:
+            start = time.perf_counter()
+            results = await asyncio.gather(*(
+                llm.generate_async(f"ping {i}", temperature=0.7) for i in range(count)
+            ))
+            elapsed = time.perf_counter() - start
+        finally:
+            _ChatHandler.delay = 0.0
+            await llm.llm.aclose()
+        
+        assert results == ["ok"] * count
+        assert elapsed < delay * count / 5
+    
+    def test_endpoint_rotation(self):
+        """Test requests rotate round-robin over the configured endpoints."""
+        keys = []
+        
+        def handler(request):
+            keys.append(request.headers["Authorization"])
+            return httpx.Response(200, json={"choices": [{"message": {"content": "ok"}}]})
+        
+        llm = GenericAdapter(
+            model_name="model",
+            provider="openai",
+            endpoints=[("k1", "https://a.invalid/v1"), ("k2", "https://b.invalid/v1")],
+            transport=httpx.MockTransport(handler)
+        )
+        for i in range(4):
+            llm.generate(f"ping {i}", temperature=0.7)
+        
+        assert keys == ["Bearer k1", "Bearer k2"] * 2
+    
+    def test_retry_moves_to_next_endpoint(self):
+        """Test a rate-limited request is retried on a different endpoint."""
+        keys = []
+        
+        def handler(request):
+            keys.append(request.headers["Authorization"])
+            if request.headers["Authorization"] == "Bearer k1":
+                return httpx.Response(429, text="rate limited")
+            return httpx.Response(200, json={"choices": [{"message": {"content": "ok"}}]})
+        
+        llm = GenericAdapter(
+            model_name="model",
+            provider="openai",
+            endpoints=[("k1", "https://a.invalid/v1"), ("k2", "https://b.invalid/v1")],
+            transport=httpx.MockTransport(handler)
+        )
+        with mock.patch("src.llms.generic_llm.time.sleep"):
+            assert llm.generate("ping", temperature=0.7) == "ok"
+        
+        assert keys == ["Bearer k1", "Bearer k2"]
+    
+    def test_model_config_endpoints(self):
+        """Test several configured keys become one endpoint each."""
+        with mock.patch.object(Config, "GROQ_API_KEYS", ("k1", "k2")):
+            Config.get_model_config.cache_clear()
+            try:
+                config = Config.get_model_config("mixtral-8x7b")
+            finally:
+                Config.get_model_config.cache_clear()
+        
+        assert config["endpoints"] == (
+            ("k1", Config.GROQ_BASE_URL), ("k2", Config.GROQ_BASE_URL)
+        )
+        assert config["api_key"] == "k1"
+    
     def test_generate_basic(self, test_llm):
         """Test basic text generation."""
         response = test_llm.generate(
@@ -77,6 +307,50 @@ class TestOrchestratorLLM:
         assert 'constraints' in plan
         assert len(plan['task']) > 0
     
+    def test_plan_structured_output(self, test_llm):
+        """Test plan() asks for its schema and finishes in a single call."""
+        orchestrator = OrchestratorLLM(test_llm)
+        
+        with mock.patch.object(test_llm, 'generate', wraps=test_llm.generate) as spy:
+            plan = orchestrator.plan("Create a function to add two numbers", no_cache=True)
+        
+        assert spy.call_count == 1
+        assert spy.call_args.kwargs['response_format']['type'] == 'json_schema'
+        assert set(plan) >= {'task', 'tests', 'constraints'}
+        
+        # Gemini gets the schema with upper-cased types and no additionalProperties
+        assert _gemini_schema(_PLAN_RESPONSE_FORMAT['json_schema']['schema']) == {
+            "type": "OBJECT",
+            "properties": {
+                "task": {"type": "STRING"},
+                "tests": {"type": "STRING"},
+                "constraints": {"type": "STRING"}
+            },
+            "required": ["task", "tests", "constraints"]
+        }
+    
+    def test_plan_falls_back_when_schema_rejected(self):
+        """Test a 400 for the schema request is retried once as plain text."""
+        sent = []
+        reply = json.dumps({"task": "Add two numbers", "tests": "add(1, 2) == 3",
+                            "constraints": "Standard library only"})
+        
+        def handler(request):
+            config = json.loads(request.content)["generationConfig"]
+            sent.append(config)
+            if "responseSchema" in config:
+                return httpx.Response(400, text="Invalid JSON payload")
+            return httpx.Response(200, json={"candidates": [{"content": {"parts": [{"text": reply}]}}]})
+        
+        llm = GenericAdapter(model_name="gemini-test", api_key="test", base_url="https://mock.invalid/v1",
+                             provider="gemini", transport=httpx.MockTransport(handler))
+        
+        plan = OrchestratorLLM(llm).plan("Create a function to add two numbers", no_cache=True)
+        
+        assert len(sent) == 2
+        assert "responseSchema" not in sent[1]
+        assert plan['task'] == "Add two numbers"
+    
     def test_reason(self, test_llm):
         """Test general reasoning."""
         orchestrator = OrchestratorLLM(test_llm)
@@ -97,6 +371,43 @@ class TestOrchestratorLLM:
         
         assert choice in options
     
+    def test_decide_falls_back_on_empty_choice(self):
+        """Test an empty constrained reply falls back to a plain request at once."""
+        sent = []
+        
+        def handler(request):
+            body = json.loads(request.content)
+            sent.append(body)
+            text = "" if "responseSchema" in body["generationConfig"] else "2"
+            return httpx.Response(200, json={"candidates": [{"content": {"parts": [{"text": text}]}}]})
+        
+        llm = GenericAdapter(model_name="gemini-test", api_key="test", base_url="https://mock.invalid/v1",
+                             provider="gemini", transport=httpx.MockTransport(handler))
+        options = ["Use a for loop", "Use list comprehension"]
+        
+        choice = OrchestratorLLM(llm).decide(options, "Double a list", no_cache=True)
+        
+        assert choice == options[1]
+        assert len(sent) == 2
+        assert "responseSchema" not in sent[1]["generationConfig"]
+    
+    def test_decide_many(self, test_llm):
+        """Test several decisions are made with a single LLM call."""
+        orchestrator = OrchestratorLLM(test_llm)
+        decisions = [
+            (["Use a for loop", "Use list comprehension"], "Double every number in a list"),
+            (["Use a list", "Use a dict"], "Look up users by id"),
+            (["Use json", "Use pickle"], "Exchange data with a web frontend"),
+        ]
+        
+        with mock.patch.object(test_llm, 'generate', wraps=test_llm.generate) as spy:
+            choices = orchestrator.decide_many(decisions, no_cache=True)
+        
+        assert spy.call_count == 1
+        assert len(choices) == len(decisions)
+        for choice, (options, _) in zip(choices, decisions):
+            assert choice in options
+    
     def test_analyze(self, test_llm):
         """Test code analysis."""
         orchestrator = OrchestratorLLM(test_llm)
@@ -108,6 +419,75 @@ class TestOrchestratorLLM:
         assert isinstance(analysis, str)
         assert len(analysis) > 0
 
+    def test_response_cache(self, test_llm):
+        """Test repeated requests are served from the cache."""
+        orchestrator = OrchestratorLLM(test_llm)
+
+        first = orchestrator.reason("Name one prime number.", max_tokens=10)
+        second = orchestrator.reason("Name one prime number.", max_tokens=10)
+
+        assert second == first
+        assert len(orchestrator.cache) == 1
+
+    def test_anthropic_prompt_cache(self, anthropic_llm, caplog):
+        """Test the second plan() reads the system prompt from Anthropic's cache."""
+        # Long enough to pass the provider's minimum cacheable prefix length
+        system_prompt = "You are an expert coding assistant and planner.\n" + "\n".join(
+            f"Guideline {i}: prefer clear, tested, standard-library Python." for i in range(200)
+        )
+        orchestrator = OrchestratorLLM(anthropic_llm, system_prompt=system_prompt)
+        
+        with caplog.at_level(logging.DEBUG, logger="src.llms.generic_llm"):
+            for _ in range(2):
+                plan = orchestrator.plan("Create a function to add two numbers", no_cache=True)
+        
+        # Request bodies are only recorded by the mock provider
+        sent = getattr(anthropic_llm, "requests", None)
+        if sent is not None:
+            system_block = {"type": "text", "text": system_prompt,
+                            "cache_control": {"type": "ephemeral"}}
+            assert [body["system"] for body in sent] == [[system_block]] * 2
+        
+        usage = [r for r in caplog.records if r.getMessage().startswith("Anthropic usage")]
+        assert len(usage) == 2
+        assert usage[0].args[1] == 0
+        assert usage[1].args[1] > 0
+        assert 'task' in plan
+    
+    def test_semantic_cache(self, test_llm):
+        """Test a paraphrased question is answered from the semantic cache."""
+        pytest.importorskip("numpy")
+        from src.llms import SemanticResponseCache
+        
+        # Toy encoder: which of a few keywords the text mentions
+        words = ("list", "dict", "prime")
+        encoder = lambda texts: [[float(w in t.lower()) for w in words] for t in texts]
+        orchestrator = OrchestratorLLM(
+            test_llm,
+            semantic_cache=SemanticResponseCache(directory=None, encoder=encoder)
+        )
+        
+        with mock.patch.object(test_llm, 'generate', wraps=test_llm.generate) as spy:
+            first = orchestrator.reason("Should I use a list or a dict for key-value pairs?")
+            second = orchestrator.reason("For key-value pairs, a dict or a list?")
+            other = orchestrator.reason("Name one prime number.")
+        
+        assert spy.call_count == 2
+        assert second == first
+        assert other != first
+
+
+def test_decode_json_array():
+    """Test batched-decision replies are decoded through the shared JSON path."""
+    decode = OrchestratorLLM._decode_json
+    
+    assert decode('[{"choice_idx": 2}]', list) == [{"choice_idx": 2}]
+    assert decode('Choices: [{"choice_idx": 1}, {"choice_idx": 2}] done', list) == [
+        {"choice_idx": 1}, {"choice_idx": 2}
+    ]
+    assert decode('```json\n[1, 2]\n```', list) == [1, 2]
+    assert decode('no array here', list) is None
+
 
 class TestCodeWriter:
     """Tests for CodeWriter."""
@@ -122,6 +502,7 @@ class TestCodeWriter:
         assert result['best']['temperature'] == 0.5
         assert isinstance(result['best']['text'], str)
     
+    @pytest.mark.slow
     def test_multi_temperature(self, test_llm):
         """Test code generation with multiple temperatures."""
         writer = CodeWriter(test_llm, temps=[0.3, 0.7], max_tokens=200)
@@ -131,6 +512,38 @@ class TestCodeWriter:
         assert result['candidates'][0]['temperature'] == 0.3
         assert result['candidates'][1]['temperature'] == 0.7
 
+    @pytest.mark.asyncio
+    async def test_multi_temperature_async(self, test_llm):
+        """Test concurrent async generation across temperatures."""
+        writer = CodeWriter(test_llm, temps=[0.3, 0.7], max_tokens=200)
+        result = await writer.generate_and_pick_async("Write: def add(a, b): return a + b")
+
+        assert len(result['candidates']) == 2
+        assert result['candidates'][0]['temperature'] == 0.3
+        assert result['candidates'][1]['temperature'] == 0.7
+        assert isinstance(result['best']['text'], str)
+
+
+def test_stream_stops_when_complete():
+    """Test a candidate stops streaming once its code block is finished."""
+    code = "def add(a, b):\n    \"\"\"Add two numbers.\"\"\"\n    return a + b\n"
+    chunks = ["```python\n", *code.splitlines(keepends=True), "```\n"]
+    chunks += ["This function adds two numbers. "] * 50
+    consumed = []
+    
+    class StreamingLLM:
+        def generate_stream(self, **kwargs):
+            for chunk in chunks:
+                consumed.append(chunk)
+                yield chunk
+    
+    writer = CodeWriter(StreamingLLM(), temps=[0.2], stop_when=looks_complete)
+    best = writer.generate_and_pick("Write an add function")['best']
+    
+    assert len(consumed) == len(code.splitlines()) + 2
+    assert best['text'].endswith("```")
+    assert not best.get('error')
+
 
 class TestLLMFactory:
     """Tests for LLMFactory."""
@@ -155,6 +568,22 @@ class TestLLMFactory:
         llm = LLMFactory.create_code_writer()
         assert llm.model_name == Config.CODEWRITER_MODEL
     
+    def test_model_config_resolved_once(self, monkeypatch):
+        """Test repeated factory calls reuse the cached model config."""
+        monkeypatch.setattr(Config, "GEMINI_API_KEY", "test-key")
+        monkeypatch.setattr(Config, "GROQ_API_KEY", "test-key")
+        # Clears Config.get_model_config's cache along with the adapters
+        LLMFactory.invalidate_model_cache()
+        try:
+            for _ in range(5):
+                LLMFactory.create_orchestrator()
+            
+            info = Config.get_model_config.cache_info()
+        finally:
+            # Don't leave the fake keys cached for later tests
+            LLMFactory.invalidate_model_cache()
+        assert (info.misses, info.hits) == (1, 4)
+    
     def test_list_available_models(self):
         """Test listing available models."""
         models = LLMFactory.list_available_models()
@@ -167,7 +596,7 @@ class TestLLMFactory:
 class TestIntegration:
     """Integration tests for complete workflows."""
     
-    def test_plan_and_generate(self, test_llm):
+    def test_plan_and_generate(self, test_llm, code_writer_llm):
         """Test complete plan → generate workflow."""
         # Step 1: Plan
         orchestrator = OrchestratorLLM(test_llm)
@@ -176,14 +605,49 @@ class TestIntegration:
         assert 'task' in plan
         
         # Step 2: Generate code
-        code_llm = LLMFactory.create_code_writer()
-        writer = CodeWriter(code_llm, temps=[0.5], max_tokens=300)
+        writer = CodeWriter(code_writer_llm, temps=[0.5], max_tokens=300)
         
         prompt = f"Task: {plan['task']}\n\nCode:"
         result = writer.generate_and_pick(prompt)
         
         assert result['best']['text']
         assert not result['best'].get('error')
+    
+    def test_plan_and_write_fused(self):
+        """Test plan + code come back from a single HTTP request."""
+        llm = MockAdapter(Config.CODEWRITER_MODEL, "groq")
+        orchestrator = OrchestratorLLM(llm)
+        
+        result = orchestrator.plan_and_write("Create a fibonacci function", no_cache=True)
+        
+        assert len(llm.requests) == 1
+        # Both halves are the mock's one fused reply, not a fallback plan
+        assert result['plan']['task'] == "Add two numbers"
+        assert result['code'] == MOCK_CODE
+    
+    def test_plan_and_write_falls_back_when_json_mode_rejected(self):
+        """Test a 400 for the JSON-mode request is retried once as plain text."""
+        sent = []
+        reply = json.dumps({"plan": {"task": "Add two numbers", "tests": "add(1, 2) == 3",
+                                     "constraints": "Standard library only"},
+                            "code": MOCK_CODE})
+        
+        def handler(request):
+            body = json.loads(request.content)
+            sent.append(body)
+            if "response_format" in body:
+                return httpx.Response(400, text="response_format is not supported")
+            return httpx.Response(200, json={"choices": [{"message": {"content": reply}}]})
+        
+        llm = GenericAdapter(model_name="model", api_key="test", base_url="https://mock.invalid/v1",
+                             provider="groq", transport=httpx.MockTransport(handler))
+        
+        result = OrchestratorLLM(llm).plan_and_write("Create a function to add two numbers", no_cache=True)
+        
+        assert len(sent) == 2
+        assert "response_format" not in sent[1]
+        assert result['plan']['task'] == "Add two numbers"
+        assert result['code'] == MOCK_CODE
 
 
 if __name__ == "__main__":